@@ -0,0 +1,117 @@
+# activity_log.py
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+import database
+from config import DATA_PATH, LOG_BATCH_SIZE, LOG_FLUSH_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+class ActivityLogWriter:
+    """Écrit le journal d'activité par lots depuis un thread dédié"""
+
+    def __init__(self, db_name, data_path=DATA_PATH,
+                 batch_size=LOG_BATCH_SIZE, flush_interval=LOG_FLUSH_INTERVAL):
+        self.db_name = db_name
+        self.data_path = data_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='activity-log', daemon=True)
+        self._thread.start()
+
+    def submit(self, device_id, action, file_path=None):
+        """Ajoute une entrée à la file (non bloquant)"""
+        self._queue.put((device_id, action, file_path, datetime.now(timezone.utc), datetime.now()))
+
+    def stop(self):
+        """Vide la file puis arrête le thread d'écriture"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join()
+
+    def _run(self):
+        batch = []
+        deadline = None
+        while True:
+            timeout = None if deadline is None else max(0, deadline - time.monotonic())
+            try:
+                record = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                record = None
+
+            if record is _STOP:
+                self._flush(batch)
+                return
+            if record is not None:
+                if not batch:
+                    deadline = time.monotonic() + self.flush_interval
+                batch.append(record)
+
+            if batch and (len(batch) >= self.batch_size or time.monotonic() >= deadline):
+                self._flush(batch)
+                batch = []
+                deadline = None
+
+    def _flush(self, batch):
+        if not batch:
+            return
+        try:
+            database.log_activities(self.db_name, [
+                (device_id, action, file_path, utc.strftime('%Y-%m-%d %H:%M:%S'))
+                for device_id, action, file_path, utc, _ in batch
+            ])
+        except Exception as e:
+            logger.error(f"Erreur journalisation (base): {e}")
+
+        # Une seule écriture par fichier activity.log
+        lines = defaultdict(list)
+        for device_id, action, file_path, _, local in batch:
+            lines[device_id].append(f"[{local}] {action}: {file_path or 'N/A'}\n")
+        for device_id, entries in lines.items():
+            log_dir = os.path.join(self.data_path, device_id, 'logs')
+            try:
+                self._append(log_dir, ''.join(entries))
+            except OSError as e:
+                logger.error(f"Erreur journalisation (fichier {device_id}): {e}")
+
+    @staticmethod
+    def _append(log_dir, text):
+        log_file = os.path.join(log_dir, 'activity.log')
+        try:
+            f = open(log_file, 'a')
+        except FileNotFoundError:
+            os.makedirs(log_dir, exist_ok=True)
+            f = open(log_file, 'a')
+        with f:
+            f.write(text)
+
+_writers = {}
+_writers_lock = threading.Lock()
+
+def get_writer(db_name):
+    """Retourne (et démarre au besoin) l'écrivain associé à une base"""
+    writer = _writers.get(db_name)
+    if writer is None:
+        with _writers_lock:
+            writer = _writers.get(db_name)
+            if writer is None:
+                writer = _writers[db_name] = ActivityLogWriter(db_name)
+    return writer
+
+def stop_all():
+    """Vide et arrête tous les écrivains (appelé à l'arrêt du bot)"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
+
+atexit.register(stop_all)
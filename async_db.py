@@ -0,0 +1,52 @@
+# async_db.py
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+import database
+import file_manager
+from config import DB_WORKERS
+
+# Pool borné dédié aux accès disque : la boucle asyncio ne bloque jamais sur SQLite
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix='db')
+
+async def run(func, *args, **kwargs):
+    """Exécute une fonction bloquante dans le pool dédié à la base"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+async def log_user_request(db_name, user_id, device_id):
+    """Version asynchrone de database.log_user_request"""
+    return await run(database.log_user_request, db_name, user_id, device_id)
+
+async def add_device(db_name, device_id, device_type):
+    """Version asynchrone de database.add_device"""
+    return await run(database.add_device, db_name, device_id, device_type)
+
+async def delete_device_folder(device_id):
+    """Supprime complètement un appareil : dossier et enregistrement en base.
+
+    Le dossier est déplacé dans la corbeille depuis le pool (immédiat); l'appareil et ses
+    requêtes sont supprimés de la base dans la transaction qui l'y enregistre. L'espace disque
+    est libéré en arrière-plan par trash.reclaim, avec les blobs devenus orphelins.
+    """
+    trash_path = await run(file_manager.trash_device_folder, device_id)
+    if trash_path is None:
+        return False
+    file_manager.forget_device_folder(device_id, trash_path)
+    return True
+
+async def log_activity(db_name, device_id, action, file_path=None):
+    """Version asynchrone de file_manager.log_activity (mise en file, sans attente disque)"""
+    return file_manager.log_activity(db_name, device_id, action, file_path)
+
+async def get_dashboard_summary(db_name):
+    """Version asynchrone de database.get_dashboard_summary"""
+    return await run(database.get_dashboard_summary, db_name)
+
+async def get_user_requests_page(db_name, before=None, after=None, limit=20):
+    """Version asynchrone de database.get_user_requests_page"""
+    return await run(database.get_user_requests_page, db_name, before, after, limit)
+
+def shutdown():
+    """Attend la fin des écritures en cours puis libère le pool"""
+    _executor.shutdown(wait=True)
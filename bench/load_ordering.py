@@ -0,0 +1,88 @@
+# bench/load_ordering.py
+# Charge simulée sur OrderedApplication : débit, latence p99 et ordre des mises à jour par utilisateur.
+# Lancement : python bench/load_ordering.py [--users 1,10,100] [--per-user 5] [--handler-ms 20] [--concurrent 8]
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime
+from telegram import Chat, Message, Update, User
+from telegram.ext import ApplicationBuilder, MessageHandler, filters
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import ordering
+
+def make_update(user_id, number):
+    """Message texte numéroté d'un utilisateur"""
+    user = User(user_id, 'bench', False)
+    chat = Chat(user_id, Chat.PRIVATE)
+    message = Message(number, datetime.now(), chat, from_user=user, text=str(number))
+    return Update(user_id * 100000 + number, message=message)
+
+async def run(users, per_user, handler_delay, concurrent):
+    """Traite users × per_user mises à jour; renvoie (mises à jour/s, p99 en s, ordre respecté)"""
+    builder = ApplicationBuilder().token('1:bench').updater(None)
+    if concurrent:
+        # Même montage que run_bot dans main.py
+        builder = (
+            builder
+            .concurrent_updates(256)
+            .application_class(ordering.OrderedApplication, {'max_concurrent': concurrent})
+        )
+    application = builder.build()
+
+    received = {}
+    latencies = []
+    sent_at = {}
+
+    # Durées variables (±50 %) : sans verrou par utilisateur, ses messages se termineraient dans le désordre
+    delays = random.Random(users)
+
+    async def handler(update, context):
+        await asyncio.sleep(handler_delay * delays.uniform(0.5, 1.5))  # Appel à l'API Telegram simulé
+        received.setdefault(update.effective_user.id, []).append(int(update.message.text))
+        latencies.append(time.monotonic() - sent_at[update.update_id])
+
+    application.add_handler(MessageHandler(filters.TEXT, handler))
+    application._initialized = True  # Pas de bot.initialize() : aucun appel réseau
+    await application.start()
+
+    start = time.monotonic()
+    for number in range(per_user):
+        for user_id in range(1, users + 1):
+            update = make_update(user_id, number)
+            sent_at[update.update_id] = time.monotonic()
+            await application.update_queue.put(update)
+    await application.update_queue.join()
+    # En mode concurrent, la file est vidée avant la fin des traitements
+    while len(latencies) < users * per_user:
+        await asyncio.sleep(0.001)
+    elapsed = time.monotonic() - start
+    await application.stop()
+
+    ordered = all(numbers == sorted(numbers) for numbers in received.values())
+    latencies.sort()
+    p99 = latencies[max(0, -(-len(latencies) * 99 // 100) - 1)]
+    return len(latencies) / elapsed, p99, ordered
+
+async def main(args):
+    ok = True
+    print(f"{'utilisateurs':>12} {'mode':>12} {'maj/s':>8} {'p99 (ms)':>9}  ordre")
+    for users in args.users:
+        for concurrent in (0, args.concurrent):
+            rate, p99, ordered = await run(users, args.per_user, args.handler_ms / 1000, concurrent)
+            mode = f"concurrent {concurrent}" if concurrent else "séquentiel"
+            print(f"{users:>12} {mode:>12} {rate:>8.0f} {p99 * 1000:>9.0f}  {'ok' if ordered else 'NON RESPECTÉ'}")
+            ok = ok and ordered
+    return ok
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--users', type=lambda s: [int(n) for n in s.split(',')], default=[1, 10, 100])
+    parser.add_argument('--per-user', type=int, default=5)
+    parser.add_argument('--handler-ms', type=float, default=20)
+    parser.add_argument('--concurrent', type=int, default=8)
+    sys.exit(0 if asyncio.run(main(parser.parse_args())) else 1)
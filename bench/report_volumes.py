@@ -0,0 +1,120 @@
+# bench/report_volumes.py
+# Rapport PDF d'un appareil au million de logs : durée totale et pic de mémoire (RSS) de la génération.
+# Lancement : python bench/report_volumes.py [--rows 100000,1000000] [--max-seconds S] [--max-rss-mb M]
+# Chaque génération tourne dans un processus neuf ('spawn', comme report_jobs) dont le pic RSS est mesuré.
+# Sortie en erreur si un budget est dépassé (mémoire : 150 Mo par défaut; durée : non vérifiée par défaut,
+# elle dépend de la machine).
+import argparse
+import multiprocessing
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Base et dossier des rapports dans un dossier temporaire (hérités par les processus de génération)
+_tmp = tempfile.mkdtemp(prefix='mdm_bench_')
+os.environ.setdefault('BOT_TOKEN', 'bench')
+os.environ.setdefault('BOT_PASSWORD', 'bench')
+os.environ.setdefault('DATA_PATH', os.path.join(_tmp, 'data'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+import report_cache
+import report_generator
+from config import PDF_ROWS_PER_VOLUME
+
+DEVICE_ID = '123456789012345'
+ACTIONS = ('UPLOAD', 'CONSULT')
+SEED_BATCH = 50000
+
+def seed(db_name, device_id, rows, first=0):
+    """Ajoute `rows` logs à l'appareil (un par minute, chemins de longueurs variées)"""
+    database.init_db(db_name)
+    database.add_device(db_name, device_id, 'imei')
+    conn = database.get_connection(db_name)
+    start = time.mktime((2024, 1, 1, 0, 0, 0, 0, 0, -1))
+    for offset in range(first, first + rows, SEED_BATCH):
+        batch = [
+            (
+                device_id,
+                ACTIONS[n % len(ACTIONS)],
+                f"/opt/render/data/{device_id}/{'photos' if n % 3 else 'documents/archives/2024'}/IMG_{n:08d}.jpg",
+                time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(start + n * 60)),
+            )
+            for n in range(offset, min(offset + SEED_BATCH, first + rows))
+        ]
+        with conn:
+            conn.executemany(
+                "INSERT INTO logs (device_id, action, file_path, timestamp) VALUES (?, ?, ?, ?)", batch
+            )
+
+def _measure(task, *args):
+    """Exécuté dans le processus de génération : (durée, pic RSS en Mo, fichiers, octets)"""
+    start = time.perf_counter()
+    result = task(*args)
+    elapsed = time.perf_counter() - start
+    files = [result] if isinstance(result, str) else list(result)
+    size = sum(os.path.getsize(f) for f in files)
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # Ko sous Linux
+    return elapsed, peak_mb, len(files), size
+
+def measure(task, *args):
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context('spawn')) as pool:
+        return pool.submit(_measure, task, *args).result()
+
+def _generate_pdf(db_name, device_id):
+    return report_generator.generate_pdf(db_name, device_id)
+
+def _cached_pdf(db_name, device_id):
+    return report_cache.build(db_name, device_id, 'pdf')
+
+def main(args):
+    ok = True
+    print(f"volumes de {PDF_ROWS_PER_VOLUME} lignes, données dans {_tmp}")
+    print(f"{'lignes':>9} {'génération':>24} {'durée (s)':>10} {'pic RSS (Mo)':>13} {'fichiers':>9} {'Mo':>7}")
+    for rows in args.rows:
+        db_name = os.path.join(_tmp, f"logs_{rows}.db")
+        seed(db_name, DEVICE_ID, rows)
+        runs = [
+            ("export (generate_pdf)", _generate_pdf),
+            ("cache, complet", _cached_pdf),
+        ]
+        for label, task in runs:
+            result = measure(task, db_name, DEVICE_ID)
+            ok = report(rows, label, result, args) and ok
+        # Nouveaux logs : seuls la synthèse et le dernier volume sont rendus à nouveau
+        seed(db_name, DEVICE_ID, args.append, first=rows)
+        result = measure(_cached_pdf, db_name, DEVICE_ID)
+        ok = report(rows, f"cache, +{args.append} lignes", result, args) and ok
+    return ok
+
+def report(rows, label, result, args):
+    elapsed, peak_mb, files, size = result
+    over = []
+    if args.max_seconds and elapsed > args.max_seconds:
+        over.append(f"durée > {args.max_seconds} s")
+    if args.max_rss_mb and peak_mb > args.max_rss_mb:
+        over.append(f"RSS > {args.max_rss_mb} Mo")
+    print(
+        f"{rows:>9} {label:>24} {elapsed:>10.1f} {peak_mb:>13.0f} {files:>9} {size / 2**20:>7.1f}"
+        + (f"  DÉPASSEMENT : {', '.join(over)}" if over else "")
+    )
+    return not over
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=lambda s: [int(n) for n in s.split(',')], default=[1000000])
+    parser.add_argument('--append', type=int, default=1000)
+    parser.add_argument('--max-seconds', type=float, default=0)
+    parser.add_argument('--max-rss-mb', type=float, default=150)
+    parser.add_argument('--keep', action='store_true', help="conserver les bases et rapports générés")
+    args = parser.parse_args()
+    try:
+        ok = main(args)
+    finally:
+        if not args.keep:
+            shutil.rmtree(_tmp, ignore_errors=True)
+    sys.exit(0 if ok else 1)
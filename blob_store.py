@@ -0,0 +1,130 @@
+# blob_store.py
+import argparse
+import hashlib
+import os
+import uuid
+import database
+from config import DATA_PATH, DB_NAME
+
+# Blobs rangés par empreinte : .blobs/ab/cd/abcd...
+BLOB_PATH = os.path.join(DATA_PATH, '.blobs')
+CHUNK_SIZE = 1024 * 1024
+
+def blob_path(sha256):
+    """Chemin du blob correspondant à une empreinte SHA-256"""
+    return os.path.join(BLOB_PATH, sha256[:2], sha256[2:4], sha256)
+
+def _link(blob, path):
+    """Remplace atomiquement `path` par un lien physique vers le blob"""
+    tmp_link = f"{blob}.{uuid.uuid4().hex}.link"
+    os.link(blob, tmp_link)
+    try:
+        os.replace(tmp_link, path)
+    except BaseException:
+        os.unlink(tmp_link)
+        raise
+
+def adopt(tmp_path, sha256, size, final_path, db_name=DB_NAME):
+    """Range un fichier téléchargé dans le magasin et le lie à son emplacement final"""
+    blob = blob_path(sha256)
+    try:
+        # Contenu déjà stocké : le fichier téléchargé n'est supprimé qu'une fois le lien créé
+        # (un blob orphelin peut être libéré entre-temps par la corbeille)
+        _link(blob, final_path)
+    except FileNotFoundError:
+        os.makedirs(os.path.dirname(blob), exist_ok=True)
+        os.replace(tmp_path, blob)
+        _link(blob, final_path)
+    else:
+        os.unlink(tmp_path)
+    database.add_blob_ref(db_name, final_path, sha256, size)
+
+def release(path, db_name=DB_NAME):
+    """Oublie les références d'un fichier ou d'un dossier supprimé et supprime les blobs orphelins"""
+    freed = 0
+    for sha256 in database.release_blob_refs(db_name, path):
+        blob = blob_path(sha256)
+        try:
+            st = os.stat(blob)
+            # Sécurité : ne jamais supprimer un blob encore lié ailleurs
+            if st.st_nlink <= 1:
+                os.unlink(blob)
+                freed += st.st_size
+        except FileNotFoundError:
+            pass
+    return freed
+
+def file_sha256(path):
+    """Calcule l'empreinte SHA-256 d'un fichier par blocs"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _iter_device_files(data_path):
+    """Parcourt les fichiers des dossiers d'appareils (hors journaux et dossiers internes)"""
+    for device in os.scandir(data_path):
+        if device.name.startswith('.') or not device.is_dir(follow_symlinks=False):
+            continue
+        for root, dirs, files in os.walk(device.path):
+            if root == device.path and 'logs' in dirs:
+                dirs.remove('logs')  # activity.log est modifié en place
+            for name in files:
+                yield os.path.join(root, name)
+
+def migrate(data_path=DATA_PATH, db_name=DB_NAME, dry_run=False):
+    """Convertit une arborescence existante en liens vers le magasin; renvoie (fichiers, octets économisés)"""
+    seen = set()
+    files = saved = 0
+    for path in _iter_device_files(data_path):
+        st = os.stat(path)
+        if st.st_size == 0 or st.st_nlink > 1 or database.is_blob_ref(db_name, path):
+            continue
+
+        sha256 = file_sha256(path)
+        blob = blob_path(sha256)
+        duplicate = sha256 in seen or os.path.exists(blob)
+        seen.add(sha256)
+        files += 1
+        if duplicate:
+            saved += st.st_size
+        if dry_run:
+            continue
+
+        if duplicate:
+            _link(blob, path)
+        else:
+            # Le fichier devient lui-même le blob : aucune copie
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.link(path, blob)
+        database.add_blob_ref(db_name, path, sha256, st.st_size)
+    return files, saved
+
+def space_report(db_name=DB_NAME):
+    """Résumé texte de l'espace économisé par la déduplication"""
+    logical, physical, count = database.get_blob_usage(db_name)
+    saved = logical - physical
+    ratio = (saved / logical * 100) if logical else 0
+    return (
+        f"Blobs : {count}\n"
+        f"Taille logique : {logical / 1024 ** 2:.1f} Mo\n"
+        f"Taille réelle : {physical / 1024 ** 2:.1f} Mo\n"
+        f"Espace économisé : {saved / 1024 ** 2:.1f} Mo ({ratio:.1f} %)"
+    )
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Stockage dédupliqué des fichiers d'appareils")
+    sub = parser.add_subparsers(dest='command', required=True)
+    migrate_parser = sub.add_parser('migrate', help="convertit les fichiers existants en liens vers le magasin")
+    migrate_parser.add_argument('--dry-run', action='store_true', help="calcule l'économie sans rien modifier")
+    sub.add_parser('report', help="affiche l'espace économisé")
+    args = parser.parse_args()
+
+    database.init_db(DB_NAME)
+    if args.command == 'migrate':
+        files, saved = migrate(dry_run=args.dry_run)
+        print(f"{files} fichiers traités, {saved / 1024 ** 2:.1f} Mo économisés"
+              + (" (simulation)" if args.dry_run else ""))
+    else:
+        print(space_report())
@@ -14,10 +14,85 @@ ADMIN_IDS = [int(x) for x in os.environ.get('ADMIN_IDS', '').split(',') if x]
 DATA_PATH = os.environ.get('DATA_PATH', './data')
 DB_NAME = os.environ.get('DB_NAME', 'mdm_bot.db')
 
+# Nombre de threads dédiés aux accès disque de la base
+DB_WORKERS = int(os.environ.get('DB_WORKERS', '4'))
+
+# Journal d'activité : taille de lot et délai maximal avant écriture (secondes)
+LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', '200'))
+LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', '1.0'))
+
+# Nombre de requêtes affichées par page du tableau de bord
+DASHBOARD_PAGE_SIZE = int(os.environ.get('DASHBOARD_PAGE_SIZE', '20'))
+
+# Nombre de fichiers affichés par page de l'explorateur
+FILE_PAGE_SIZE = int(os.environ.get('FILE_PAGE_SIZE', '10'))
+
+# Téléversements : taille maximale (octets) et nombre de téléchargements simultanés
+MAX_UPLOAD_SIZE = int(os.environ.get('MAX_UPLOAD_SIZE', str(20 * 1024 * 1024)))
+UPLOAD_CONCURRENCY = int(os.environ.get('UPLOAD_CONCURRENCY', '4'))
+
+# Stockage dédupliqué par contenu (SHA-256) des fichiers téléversés
+CAS_ENABLED = os.environ.get('CAS_ENABLED', '0').lower() in ('1', 'true', 'yes')
+
+# Rapports : processus de génération, nombre maximal en attente et quota du cache (octets)
+REPORT_WORKERS = int(os.environ.get('REPORT_WORKERS', '2'))
+REPORT_MAX_PENDING = int(os.environ.get('REPORT_MAX_PENDING', '10'))
+REPORT_CACHE_QUOTA = int(os.environ.get('REPORT_CACHE_QUOTA', str(1024 * 1024 * 1024)))
+# Nombre maximal de lignes par volume PDF
+PDF_ROWS_PER_VOLUME = int(os.environ.get('PDF_ROWS_PER_VOLUME', '20000'))
+
+# Envois Telegram : délai maximal par appel (secondes, reprises comprises)
+# et bornes du délai exponentiel entre deux tentatives
+SEND_DEADLINE = float(os.environ.get('SEND_DEADLINE', '30'))
+SEND_BACKOFF_BASE = float(os.environ.get('SEND_BACKOFF_BASE', '0.5'))
+SEND_BACKOFF_MAX = float(os.environ.get('SEND_BACKOFF_MAX', '10'))
+
+# Débit d'envoi (messages/seconde) : global, par conversation, et rafale tolérée par conversation
+SEND_GLOBAL_RATE = float(os.environ.get('SEND_GLOBAL_RATE', '25'))
+SEND_CHAT_RATE = float(os.environ.get('SEND_CHAT_RATE', '1'))
+SEND_CHAT_BURST = int(os.environ.get('SEND_CHAT_BURST', '3'))
+
+# Nombre de mises à jour traitées simultanément (0 : une à la fois)
+CONCURRENT_UPDATES = int(os.environ.get('CONCURRENT_UPDATES', '8'))
+
+# Réception des mises à jour : 'polling' (par défaut) ou 'webhook'
+BOT_MODE = os.environ.get('BOT_MODE', 'polling').lower()
+# Webhook : URL publique (Render la fournit), port d'écoute, chemin et jeton secret
+WEBHOOK_URL = os.environ.get('WEBHOOK_URL', os.environ.get('RENDER_EXTERNAL_URL', '')).rstrip('/')
+PORT = int(os.environ.get('PORT', '8080'))
+WEBHOOK_PATH = os.environ.get('WEBHOOK_PATH', 'telegram').strip('/')
+WEBHOOK_SECRET = os.environ.get('WEBHOOK_SECRET', '')
+# Mises à jour en attente au-delà desquelles le webhook répond 503 (Telegram renverra)
+WEBHOOK_MAX_PENDING = int(os.environ.get('WEBHOOK_MAX_PENDING', '100'))
+# Connexions simultanées ouvertes par Telegram vers le webhook
+WEBHOOK_MAX_CONNECTIONS = int(os.environ.get('WEBHOOK_MAX_CONNECTIONS', '40'))
+
+# Intervalle (secondes) d'enregistrement de l'état des conversations dans la base
+PERSISTENCE_INTERVAL = float(os.environ.get('PERSISTENCE_INTERVAL', '10'))
+
+# Cache des listes de fichiers : nombre de dossiers conservés et durée (secondes)
+# pendant laquelle une liste est servie sans vérifier la date de modification du dossier
+LISTING_CACHE_SIZE = int(os.environ.get('LISTING_CACHE_SIZE', '512'))
+LISTING_CACHE_TTL = float(os.environ.get('LISTING_CACHE_TTL', '2'))
+
+# Nombre de threads supprimant en parallèle les fichiers des appareils supprimés
+TRASH_WORKERS = int(os.environ.get('TRASH_WORKERS', '4'))
+
+# Arborescence des appareils créée à la demande : dossiers de catégorie au premier fichier reçu
+LAZY_LAYOUT = os.environ.get('LAZY_LAYOUT', '1').lower() in ('1', 'true', 'yes')
+
+# Quotas d'espace disque (octets, 0 = illimité) par appareil et pour l'ensemble des appareils,
+# et intervalle (secondes) du recalcul de l'index d'espace utilisé depuis le disque
+STORAGE_DEVICE_QUOTA = int(os.environ.get('STORAGE_DEVICE_QUOTA', '0'))
+STORAGE_GLOBAL_QUOTA = int(os.environ.get('STORAGE_GLOBAL_QUOTA', '0'))
+STORAGE_RECONCILE_INTERVAL = int(os.environ.get('STORAGE_RECONCILE_INTERVAL', str(6 * 3600)))
+
 # Validation
 if not BOT_TOKEN:
     raise ValueError("BOT_TOKEN n'est pas configuré")
 if not BOT_PASSWORD:
     raise ValueError("BOT_PASSWORD n'est pas configuré")
+if BOT_MODE not in ('polling', 'webhook'):
+    raise ValueError("BOT_MODE doit valoir 'polling' ou 'webhook'")
 if not ADMIN_IDS:
     print("Avertissement: Aucun ID administrateur configuré")
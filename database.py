@@ -1,65 +1,743 @@
 # database.py
+import os
 import sqlite3
-from datetime import datetime
+import threading
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+# Réglages des connexions SQLite
+CACHE_SIZE_KB = 8192        # Cache de pages par connexion (PRAGMA cache_size négatif = Ko)
+STATEMENT_CACHE_SIZE = 128  # Requêtes préparées conservées par connexion
+
+# Une connexion par thread et par base, réutilisée d'un appel à l'autre
+_local = threading.local()
+_all_connections = []
+_connections_lock = threading.Lock()
+
+def get_connection(db_name):
+    """Retourne la connexion partagée du thread courant pour cette base"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = {}
+
+    conn = connections.get(db_name)
+    if conn is None:
+        conn = sqlite3.connect(
+            db_name,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False  # Permet la fermeture depuis close_connections()
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA cache_size=-{CACHE_SIZE_KB}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        connections[db_name] = conn
+        with _connections_lock:
+            _all_connections.append(conn)
+    return conn
+
+def close_connections():
+    """Ferme toutes les connexions ouvertes par le processus"""
+    with _connections_lock:
+        for conn in _all_connections:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        _all_connections.clear()
+    _local.__dict__.clear()
+
+# Migrations de schéma, appliquées dans l'ordre au démarrage.
+# PRAGMA user_version contient le nombre de migrations déjà appliquées :
+# ne jamais modifier ni réordonner une entrée existante, seulement en ajouter.
+MIGRATIONS = [
+    # 1 : index des requêtes par appareil et par date
+    [
+        "CREATE INDEX IF NOT EXISTS idx_logs_device_timestamp ON logs(device_id, timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_user_requests_device ON user_requests(device_id)",
+        "CREATE INDEX IF NOT EXISTS idx_user_requests_timestamp ON user_requests(timestamp)",
+        "CREATE INDEX IF NOT EXISTS idx_user_requests_user_timestamp ON user_requests(user_id, timestamp)",
+    ],
+    # 2 : cache des file_id Telegram des fichiers déjà envoyés
+    [
+        '''CREATE TABLE IF NOT EXISTS telegram_files
+           (path TEXT PRIMARY KEY,
+            mtime_ns INTEGER,
+            size INTEGER,
+            file_id TEXT)''',
+    ],
+    # 3 : stockage adressé par contenu (blobs SHA-256 et fichiers qui y sont liés)
+    [
+        '''CREATE TABLE IF NOT EXISTS blobs
+           (sha256 TEXT PRIMARY KEY,
+            size INTEGER,
+            refs INTEGER)''',
+        '''CREATE TABLE IF NOT EXISTS blob_refs
+           (path TEXT PRIMARY KEY,
+            sha256 TEXT)''',
+        "CREATE INDEX IF NOT EXISTS idx_blob_refs_sha256 ON blob_refs(sha256)",
+    ],
+    # 4 : rapports en cache, avec le plus grand logs.id qu'ils couvrent
+    [
+        '''CREATE TABLE IF NOT EXISTS report_cache
+           (device_id TEXT,
+            format TEXT,
+            path TEXT,
+            max_log_id INTEGER,
+            size INTEGER,
+            last_used REAL,
+            PRIMARY KEY (device_id, format))''',
+    ],
+    # 5 : état des conversations (données utilisateur, états, jobs en attente) conservé entre redémarrages
+    [
+        '''CREATE TABLE IF NOT EXISTS user_sessions
+           (user_id INTEGER PRIMARY KEY,
+            data TEXT)''',
+        '''CREATE TABLE IF NOT EXISTS conversations
+           (name TEXT,
+            key TEXT,
+            state TEXT,
+            PRIMARY KEY (name, key))''',
+        '''CREATE TABLE IF NOT EXISTS pending_jobs
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            callback TEXT,
+            due REAL,
+            chat_id INTEGER,
+            user_id INTEGER,
+            data TEXT)''',
+    ],
+    # 6 : dossiers d'appareils supprimés en attente de libération de l'espace disque
+    [
+        '''CREATE TABLE IF NOT EXISTS trash
+           (path TEXT PRIMARY KEY,
+            original_path TEXT,
+            device_id TEXT,
+            deleted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''',
+    ],
+    # 7 : espace utilisé par appareil et par catégorie, et total par appareil (classement)
+    [
+        '''CREATE TABLE IF NOT EXISTS storage_usage
+           (device_id TEXT,
+            category TEXT,
+            bytes INTEGER,
+            files INTEGER,
+            PRIMARY KEY (device_id, category))''',
+        '''CREATE TABLE IF NOT EXISTS storage_devices
+           (device_id TEXT PRIMARY KEY,
+            bytes INTEGER,
+            files INTEGER)''',
+        "CREATE INDEX IF NOT EXISTS idx_storage_devices_bytes ON storage_devices(bytes)",
+    ],
+    # 8 : compteurs de requêtes par utilisateur et par cible (classements du tableau de bord)
+    [
+        '''CREATE TABLE IF NOT EXISTS user_request_counts
+           (user_id INTEGER PRIMARY KEY,
+            n INTEGER)''',
+        '''CREATE TABLE IF NOT EXISTS device_request_counts
+           (device_id TEXT PRIMARY KEY,
+            n INTEGER)''',
+        "CREATE INDEX IF NOT EXISTS idx_user_request_counts_n ON user_request_counts(n)",
+        "CREATE INDEX IF NOT EXISTS idx_device_request_counts_n ON device_request_counts(n)",
+        "INSERT INTO user_request_counts (user_id, n) SELECT user_id, COUNT(*) FROM user_requests GROUP BY user_id",
+        "INSERT INTO device_request_counts (device_id, n) SELECT device_id, COUNT(*) FROM user_requests GROUP BY device_id",
+    ],
+    # 9 : appareil et requêtes d'un dossier placé dans la corbeille, restaurés si son déplacement échoue
+    [
+        '''CREATE TABLE IF NOT EXISTS trash_devices
+           (path TEXT PRIMARY KEY,
+            id TEXT,
+            type TEXT,
+            created_at TIMESTAMP)''',
+        '''CREATE TABLE IF NOT EXISTS trash_requests
+           (path TEXT,
+            id INTEGER,
+            user_id INTEGER,
+            device_id TEXT,
+            timestamp TIMESTAMP)''',
+        "CREATE INDEX IF NOT EXISTS idx_trash_requests_path ON trash_requests(path)",
+    ],
+    # 10 : logs d'un appareil dans l'ordre des id (rapports en cache complétés), sans tri en mémoire
+    [
+        "CREATE INDEX IF NOT EXISTS idx_logs_device ON logs(device_id)",
+    ],
+]
+
+def migrate(conn):
+    """Applique les migrations manquantes, chacune dans sa propre transaction"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for number, steps in enumerate(MIGRATIONS[version:], start=version + 1):
+        with conn:
+            conn.execute("BEGIN")
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {number}")
+    return len(MIGRATIONS)
 
 def init_db(db_name):
     """Initialise la base de données"""
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    
-    # Table appareils
-    c.execute('''CREATE TABLE IF NOT EXISTS devices
-                 (id TEXT PRIMARY KEY, 
-                  type TEXT,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-                  
-    # Table logs
-    c.execute('''CREATE TABLE IF NOT EXISTS logs
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  device_id TEXT, 
-                  action TEXT, 
-                  file_path TEXT,
-                  timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY(device_id) REFERENCES devices(id))''')
-    
-    # Table des requêtes utilisateurs
-    c.execute('''CREATE TABLE IF NOT EXISTS user_requests
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  device_id TEXT,
-                  timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    conn.commit()
-    conn.close()
+    conn = get_connection(db_name)
+    with conn:
+        # Table appareils
+        conn.execute('''CREATE TABLE IF NOT EXISTS devices
+                     (id TEXT PRIMARY KEY,
+                      type TEXT,
+                      created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+        # Table logs
+        conn.execute('''CREATE TABLE IF NOT EXISTS logs
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      device_id TEXT,
+                      action TEXT,
+                      file_path TEXT,
+                      timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                      FOREIGN KEY(device_id) REFERENCES devices(id))''')
+
+        # Table des requêtes utilisateurs
+        conn.execute('''CREATE TABLE IF NOT EXISTS user_requests
+                     (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                      user_id INTEGER,
+                      device_id TEXT,
+                      timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+
+    migrate(conn)
 
 def add_device(db_name, device_id, device_type):
     """Ajoute un appareil à la base de données"""
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
+    conn = get_connection(db_name)
     try:
-        c.execute("INSERT INTO devices (id, type) VALUES (?, ?)", (device_id, device_type))
-        conn.commit()
+        with conn:
+            conn.execute("INSERT INTO devices (id, type) VALUES (?, ?)", (device_id, device_type))
     except sqlite3.IntegrityError:
         pass  # Existe déjà
-    finally:
-        conn.close()
+
+def add_devices(db_name, devices):
+    """Ajoute un lot d'appareils (id, type), en ignorant ceux qui existent déjà"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.executemany("INSERT OR IGNORE INTO devices (id, type) VALUES (?, ?)", devices)
+
+def get_device_ids(db_name):
+    """Retourne les identifiants de tous les appareils enregistrés"""
+    conn = get_connection(db_name)
+    return [row[0] for row in conn.execute("SELECT id FROM devices")]
+
+def _delete_device(conn, device_id):
+    """Supprime un appareil, ses requêtes et leurs compteurs (dans la transaction en cours)"""
+    conn.execute("DELETE FROM devices WHERE id = ?", (device_id,))
+    # Compteurs par utilisateur diminués des requêtes supprimées (index idx_user_requests_device)
+    conn.executemany(
+        "UPDATE user_request_counts SET n = n - ? WHERE user_id = ?",
+        [(n, user_id) for user_id, n in conn.execute(
+            "SELECT user_id, COUNT(*) FROM user_requests WHERE device_id = ? GROUP BY user_id",
+            (device_id,)
+        )]
+    )
+    conn.execute("DELETE FROM user_request_counts WHERE n <= 0")
+    conn.execute("DELETE FROM device_request_counts WHERE device_id = ?", (device_id,))
+    conn.execute("DELETE FROM user_requests WHERE device_id = ?", (device_id,))
 
 def delete_device(db_name, device_id):
     """Supprime un appareil de la base de données"""
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("DELETE FROM devices WHERE id = ?", (device_id,))
-    c.execute("DELETE FROM user_requests WHERE device_id = ?", (device_id,))
-    conn.commit()
-    conn.close()
+    conn = get_connection(db_name)
+    with conn:
+        _delete_device(conn, device_id)
 
 def log_user_request(db_name, user_id, device_id):
     """Journalise une requête utilisateur"""
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute(
-        "INSERT INTO user_requests (user_id, device_id) VALUES (?, ?)",
-        (user_id, device_id)
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT INTO user_requests (user_id, device_id) VALUES (?, ?)",
+            (user_id, device_id)
+        )
+        conn.execute(
+            "INSERT INTO user_request_counts (user_id, n) VALUES (?, 1) "
+            "ON CONFLICT(user_id) DO UPDATE SET n = n + 1",
+            (user_id,)
+        )
+        conn.execute(
+            "INSERT INTO device_request_counts (device_id, n) VALUES (?, 1) "
+            "ON CONFLICT(device_id) DO UPDATE SET n = n + 1",
+            (device_id,)
+        )
+
+def log_activities(db_name, rows):
+    """Insère un lot de logs (device_id, action, file_path, timestamp) en une transaction"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.executemany(
+            "INSERT INTO logs (device_id, action, file_path, timestamp) VALUES (?, ?, ?, ?)",
+            rows
+        )
+
+def count_requests_by_user(db_name, limit=10):
+    """Retourne les utilisateurs ayant fait le plus de requêtes (compteurs tenus par log_user_request)"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT user_id, n FROM user_request_counts ORDER BY n DESC LIMIT ?",
+        (limit,)
+    ).fetchall()
+
+def count_requests_by_device(db_name, limit=10):
+    """Retourne les cibles les plus demandées (compteurs tenus par log_user_request)"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT device_id, n FROM device_request_counts ORDER BY n DESC LIMIT ?",
+        (limit,)
+    ).fetchall()
+
+def count_requests_by_period(db_name, period='day', limit=7):
+    """Retourne le nombre de requêtes des `limit` derniers jours ('day') ou heures ('hour'), les plus récents d'abord.
+
+    Seule la fenêtre est lue (parcours d'intervalle sur idx_user_requests_timestamp).
+    """
+    now = datetime.now(timezone.utc)  # CURRENT_TIMESTAMP est en UTC
+    if period == 'day':
+        width = 10  # 'YYYY-MM-DD'
+        start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=limit - 1)
+    else:
+        width = 13  # 'YYYY-MM-DD HH'
+        start = now.replace(minute=0, second=0, microsecond=0) - timedelta(hours=limit - 1)
+    conn = get_connection(db_name)
+    return conn.execute(
+        f"SELECT substr(timestamp, 1, {width}) AS p, COUNT(*) FROM user_requests "
+        "WHERE timestamp >= ? GROUP BY p ORDER BY p DESC",
+        (start.strftime('%Y-%m-%d %H:%M:%S'),)
+    ).fetchall()
+
+def get_dashboard_summary(db_name):
+    """Regroupe les agrégats du tableau de bord"""
+    return {
+        'by_user': count_requests_by_user(db_name),
+        'by_device': count_requests_by_device(db_name),
+        'by_day': count_requests_by_period(db_name, 'day', 7),
+        'by_hour': count_requests_by_period(db_name, 'hour', 24),
+    }
+
+def get_user_requests_page(db_name, before=None, after=None, limit=20):
+    """Retourne une page de requêtes (id, user_id, device_id, timestamp), des plus récentes aux plus anciennes.
+
+    Pagination par clé (timestamp, id) : `before` donne la page suivante (plus ancienne),
+    `after` la page précédente (plus récente). Renvoie (lignes, autre_page_disponible).
+    """
+    conn = get_connection(db_name)
+    if after is not None:
+        rows = conn.execute(
+            "SELECT id, user_id, device_id, timestamp FROM user_requests "
+            "WHERE (timestamp, id) > (?, ?) ORDER BY timestamp ASC, id ASC LIMIT ?",
+            (after[0], after[1], limit + 1)
+        ).fetchall()
+        has_more = len(rows) > limit
+        return list(reversed(rows[:limit])), has_more
+
+    if before is not None:
+        rows = conn.execute(
+            "SELECT id, user_id, device_id, timestamp FROM user_requests "
+            "WHERE (timestamp, id) < (?, ?) ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (before[0], before[1], limit + 1)
+        ).fetchall()
+    else:
+        rows = conn.execute(
+            "SELECT id, user_id, device_id, timestamp FROM user_requests "
+            "ORDER BY timestamp DESC, id DESC LIMIT ?",
+            (limit + 1,)
+        ).fetchall()
+    return rows[:limit], len(rows) > limit
+
+def _logs_filter(device_id, since=None, until=None, actions=None, after_id=None, up_to_id=None):
+    """Clause WHERE (et ses paramètres) des requêtes sur les logs d'un appareil"""
+    sql = "device_id = ?"
+    params = [device_id]
+    if since:
+        sql += " AND timestamp >= ?"
+        params.append(since)
+    if until:
+        sql += " AND timestamp < ?"
+        params.append(until)
+    if actions:
+        sql += f" AND action IN ({', '.join('?' * len(actions))})"
+        params.extend(actions)
+    if after_id is not None:
+        sql += " AND id > ?"
+        params.append(after_id)
+    if up_to_id is not None:
+        sql += " AND id <= ?"
+        params.append(up_to_id)
+    return sql, params
+
+def iter_device_logs(db_name, device_id, since=None, until=None, actions=None,
+                     after_id=None, up_to_id=None, chunk_size=5000):
+    """Parcourt les logs d'un appareil par blocs de lignes, filtres appliqués en SQL.
+
+    `since` (inclus) et `until` (exclu) sont des horodatages 'AAAA-MM-JJ HH:MM:SS'.
+    Avec `after_id`/`up_to_id`, seules les lignes d'id dans ]after_id, up_to_id] sont lues,
+    dans l'ordre des id (pour compléter un rapport existant).
+    """
+    where, params = _logs_filter(device_id, since, until, actions, after_id, up_to_id)
+    order = "id" if after_id is not None else "timestamp, id"
+    sql = f"SELECT id, device_id, action, file_path, timestamp FROM logs WHERE {where} ORDER BY {order}"
+
+    # Curseur dédié : la connexion partagée reste utilisable pendant le parcours
+    cursor = get_connection(db_name).execute(sql, params)
+    try:
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        cursor.close()
+
+def count_device_logs(db_name, device_id, group_by, since=None, until=None, actions=None, up_to_id=None):
+    """Compte les logs d'un appareil par action ('action') ou par jour ('day').
+
+    Comptage en un parcours, mémoire proportionnelle au nombre de groupes : un GROUP BY
+    SQLite trierait toutes les lignes en mémoire (temp_store=MEMORY).
+    """
+    where, params = _logs_filter(device_id, since, until, actions, up_to_id=up_to_id)
+    key = "action" if group_by == 'action' else "substr(timestamp, 1, 10)"
+    cursor = get_connection(db_name).execute(f"SELECT {key} FROM logs WHERE {where}", params)
+    try:
+        counts = Counter(k for k, in cursor)
+    finally:
+        cursor.close()
+    # Même ordre que ORDER BY : valeur NULL d'abord
+    return sorted(counts.items(), key=lambda item: (item[0] is not None, item[0] or ''))
+
+def get_telegram_file(db_name, path):
+    """Retourne (mtime_ns, size, file_id) du dernier envoi de ce fichier, ou None"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT mtime_ns, size, file_id FROM telegram_files WHERE path = ?", (path,)
+    ).fetchone()
+
+def set_telegram_file(db_name, path, mtime_ns, size, file_id):
+    """Mémorise le file_id Telegram d'un fichier pour sa version (mtime, taille) actuelle"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO telegram_files (path, mtime_ns, size, file_id) VALUES (?, ?, ?, ?)",
+            (path, mtime_ns, size, file_id)
+        )
+
+def _path_range(path):
+    """Bornes (chemin, début, fin) couvrant un fichier ou tout un dossier.
+
+    L'intervalle [dossier/, dossier0) parcourt la clé primaire, contrairement à LIKE.
+    """
+    prefix = path.rstrip(os.sep) + os.sep
+    return path, prefix, prefix[:-1] + chr(ord(os.sep) + 1)
+
+def delete_telegram_files(db_name, path):
+    """Oublie le file_id d'un fichier, ou de tous les fichiers sous un dossier"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "DELETE FROM telegram_files WHERE path = ? OR (path >= ? AND path < ?)",
+            _path_range(path)
+        )
+
+def add_blob_ref(db_name, path, sha256, size):
+    """Enregistre qu'un fichier est un lien vers le blob sha256"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT INTO blobs (sha256, size, refs) VALUES (?, ?, 1) "
+            "ON CONFLICT(sha256) DO UPDATE SET refs = refs + 1",
+            (sha256, size)
+        )
+        conn.execute("INSERT INTO blob_refs (path, sha256) VALUES (?, ?)", (path, sha256))
+
+def is_blob_ref(db_name, path):
+    """Indique si un fichier est déjà lié au stockage par contenu"""
+    conn = get_connection(db_name)
+    return conn.execute("SELECT 1 FROM blob_refs WHERE path = ?", (path,)).fetchone() is not None
+
+def release_blob_refs(db_name, path):
+    """Retire les références d'un fichier ou d'un dossier; renvoie les blobs devenus orphelins"""
+    bounds = _path_range(path)
+    conn = get_connection(db_name)
+    with conn:
+        counts = conn.execute(
+            "SELECT sha256, COUNT(*) FROM blob_refs WHERE path = ? OR (path >= ? AND path < ?) "
+            "GROUP BY sha256",
+            bounds
+        ).fetchall()
+        if not counts:
+            return []
+        conn.execute("DELETE FROM blob_refs WHERE path = ? OR (path >= ? AND path < ?)", bounds)
+        conn.executemany(
+            "UPDATE blobs SET refs = refs - ? WHERE sha256 = ?",
+            [(n, sha256) for sha256, n in counts]
+        )
+        orphans = [
+            sha256 for sha256, _ in counts
+            if conn.execute("SELECT refs FROM blobs WHERE sha256 = ?", (sha256,)).fetchone()[0] <= 0
+        ]
+        conn.executemany("DELETE FROM blobs WHERE sha256 = ?", [(sha256,) for sha256 in orphans])
+    return orphans
+
+def get_blob_usage(db_name):
+    """Retourne (taille logique, taille réelle, nombre de blobs) du stockage par contenu"""
+    conn = get_connection(db_name)
+    logical = conn.execute(
+        "SELECT COALESCE(SUM(b.size), 0) FROM blob_refs r JOIN blobs b ON b.sha256 = r.sha256"
+    ).fetchone()[0]
+    physical, count = conn.execute("SELECT COALESCE(SUM(size), 0), COUNT(*) FROM blobs").fetchone()
+    return logical, physical, count
+
+def get_max_log_id(db_name, device_id):
+    """Retourne le plus grand logs.id d'un appareil (0 s'il n'a aucun log)"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT COALESCE(MAX(id), 0) FROM logs WHERE device_id = ?", (device_id,)
+    ).fetchone()[0]
+
+def get_report_cache(db_name, device_id, format_type):
+    """Retourne (path, max_log_id) du rapport en cache, ou None"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT path, max_log_id FROM report_cache WHERE device_id = ? AND format = ?",
+        (device_id, format_type)
+    ).fetchone()
+
+def set_report_cache(db_name, device_id, format_type, path, max_log_id, size, last_used):
+    """Enregistre ou met à jour un rapport en cache"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO report_cache (device_id, format, path, max_log_id, size, last_used) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (device_id, format_type, path, max_log_id, size, last_used)
+        )
+
+def touch_report_cache(db_name, device_id, format_type, last_used):
+    """Marque un rapport en cache comme utilisé"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "UPDATE report_cache SET last_used = ? WHERE device_id = ? AND format = ?",
+            (last_used, device_id, format_type)
+        )
+
+def list_report_cache(db_name, device_id=None):
+    """Liste (device_id, format, path, size) des rapports en cache, du moins récemment utilisé au plus récent"""
+    conn = get_connection(db_name)
+    if device_id is not None:
+        return conn.execute(
+            "SELECT device_id, format, path, size FROM report_cache WHERE device_id = ? ORDER BY last_used",
+            (device_id,)
+        ).fetchall()
+    return conn.execute(
+        "SELECT device_id, format, path, size FROM report_cache ORDER BY last_used"
+    ).fetchall()
+
+def delete_report_cache(db_name, device_id, format_type):
+    """Retire un rapport du cache"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "DELETE FROM report_cache WHERE device_id = ? AND format = ?", (device_id, format_type)
+        )
+
+def get_user_sessions(db_name):
+    """Retourne les (user_id, données JSON) conservées"""
+    conn = get_connection(db_name)
+    return conn.execute("SELECT user_id, data FROM user_sessions").fetchall()
+
+def set_user_session(db_name, user_id, data):
+    """Enregistre les données JSON d'un utilisateur"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO user_sessions (user_id, data) VALUES (?, ?)", (user_id, data)
+        )
+
+def delete_user_session(db_name, user_id):
+    """Supprime les données conservées d'un utilisateur"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute("DELETE FROM user_sessions WHERE user_id = ?", (user_id,))
+
+def get_conversations(db_name, name):
+    """Retourne les (clé JSON, état JSON) d'un ConversationHandler"""
+    conn = get_connection(db_name)
+    return conn.execute("SELECT key, state FROM conversations WHERE name = ?", (name,)).fetchall()
+
+def set_conversation(db_name, name, key, state):
+    """Enregistre l'état d'une conversation (None : conversation terminée)"""
+    conn = get_connection(db_name)
+    with conn:
+        if state is None:
+            conn.execute("DELETE FROM conversations WHERE name = ? AND key = ?", (name, key))
+        else:
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (name, key, state) VALUES (?, ?, ?)",
+                (name, key, state)
+            )
+
+def add_pending_job(db_name, callback, due, chat_id, user_id, data):
+    """Enregistre un job ponctuel planifié; renvoie son identifiant"""
+    conn = get_connection(db_name)
+    with conn:
+        cursor = conn.execute(
+            "INSERT INTO pending_jobs (callback, due, chat_id, user_id, data) VALUES (?, ?, ?, ?, ?)",
+            (callback, due, chat_id, user_id, data)
+        )
+    return cursor.lastrowid
+
+def delete_pending_job(db_name, job_id):
+    """Retire un job exécuté"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute("DELETE FROM pending_jobs WHERE id = ?", (job_id,))
+
+def list_pending_jobs(db_name):
+    """Liste les (id, callback, échéance, chat_id, user_id, données JSON) des jobs en attente"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT id, callback, due, chat_id, user_id, data FROM pending_jobs ORDER BY due"
+    ).fetchall()
+
+def _move_blob_refs(conn, old_path, new_path):
+    """Reporte les références aux blobs d'un dossier sur son nouveau chemin"""
+    conn.execute(
+        "UPDATE blob_refs SET path = ? || substr(path, ?) WHERE path = ? OR (path >= ? AND path < ?)",
+        (new_path, len(old_path) + 1) + _path_range(old_path)
     )
-    conn.commit()
-    conn.close()
+
+def add_trash(db_name, path, original_path, device_id):
+    """Enregistre un dossier placé dans la corbeille (avant son déplacement) et supprime son appareil.
+
+    Dans la même transaction : ses références aux blobs suivent le dossier (un appareil
+    recréé au même chemin ne partage rien avec la corbeille), l'appareil et ses requêtes
+    sont supprimés après en avoir gardé une copie pour cancel_trash.
+    """
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT INTO trash (path, original_path, device_id) VALUES (?, ?, ?)",
+            (path, original_path, device_id)
+        )
+        _move_blob_refs(conn, original_path, path)
+        conn.execute(
+            "INSERT INTO trash_devices (path, id, type, created_at) "
+            "SELECT ?, id, type, created_at FROM devices WHERE id = ?",
+            (path, device_id)
+        )
+        conn.execute(
+            "INSERT INTO trash_requests (path, id, user_id, device_id, timestamp) "
+            "SELECT ?, id, user_id, device_id, timestamp FROM user_requests WHERE device_id = ?",
+            (path, device_id)
+        )
+        _delete_device(conn, device_id)
+
+def _forget_trash(conn, path):
+    conn.execute("DELETE FROM trash WHERE path = ?", (path,))
+    conn.execute("DELETE FROM trash_devices WHERE path = ?", (path,))
+    conn.execute("DELETE FROM trash_requests WHERE path = ?", (path,))
+
+def cancel_trash(db_name, path, original_path):
+    """Annule add_trash quand le déplacement du dossier a échoué (appareil, requêtes et compteurs restaurés)"""
+    conn = get_connection(db_name)
+    with conn:
+        _move_blob_refs(conn, path, original_path)
+        conn.execute(
+            "INSERT OR IGNORE INTO devices (id, type, created_at) "
+            "SELECT id, type, created_at FROM trash_devices WHERE path = ?",
+            (path,)
+        )
+        conn.execute(
+            "INSERT OR IGNORE INTO user_requests (id, user_id, device_id, timestamp) "
+            "SELECT id, user_id, device_id, timestamp FROM trash_requests WHERE path = ?",
+            (path,)
+        )
+        conn.execute(
+            "INSERT INTO user_request_counts (user_id, n) "
+            "SELECT user_id, COUNT(*) FROM trash_requests WHERE path = ? GROUP BY user_id "
+            "ON CONFLICT(user_id) DO UPDATE SET n = n + excluded.n",
+            (path,)
+        )
+        conn.execute(
+            "INSERT INTO device_request_counts (device_id, n) "
+            "SELECT device_id, COUNT(*) FROM trash_requests WHERE path = ? GROUP BY device_id "
+            "ON CONFLICT(device_id) DO UPDATE SET n = n + excluded.n",
+            (path,)
+        )
+        _forget_trash(conn, path)
+
+def delete_trash(db_name, path):
+    """Oublie un dossier de la corbeille dont l'espace a été libéré"""
+    conn = get_connection(db_name)
+    with conn:
+        _forget_trash(conn, path)
+
+def list_trash(db_name):
+    """Liste les (chemin, chemin d'origine, appareil) des dossiers en attente de libération"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT path, original_path, device_id FROM trash ORDER BY deleted_at"
+    ).fetchall()
+
+def add_storage_usage(db_name, device_id, category, size, files=1):
+    """Ajoute des octets et des fichiers à l'espace utilisé d'une catégorie et de son appareil"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute(
+            "INSERT INTO storage_usage (device_id, category, bytes, files) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT(device_id, category) DO UPDATE SET bytes = bytes + excluded.bytes, "
+            "files = files + excluded.files",
+            (device_id, category, size, files)
+        )
+        conn.execute(
+            "INSERT INTO storage_devices (device_id, bytes, files) VALUES (?, ?, ?) "
+            "ON CONFLICT(device_id) DO UPDATE SET bytes = bytes + excluded.bytes, "
+            "files = files + excluded.files",
+            (device_id, size, files)
+        )
+
+def delete_storage_usage(db_name, device_id):
+    """Oublie l'espace utilisé par un appareil supprimé"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute("DELETE FROM storage_usage WHERE device_id = ?", (device_id,))
+        conn.execute("DELETE FROM storage_devices WHERE device_id = ?", (device_id,))
+
+def replace_storage_usage(db_name, rows):
+    """Remplace tout l'index par les (appareil, catégorie, octets, fichiers) mesurés sur le disque"""
+    conn = get_connection(db_name)
+    with conn:
+        conn.execute("DELETE FROM storage_usage")
+        conn.execute("DELETE FROM storage_devices")
+        conn.executemany(
+            "INSERT INTO storage_usage (device_id, category, bytes, files) VALUES (?, ?, ?, ?)",
+            rows
+        )
+        conn.execute(
+            "INSERT INTO storage_devices (device_id, bytes, files) "
+            "SELECT device_id, SUM(bytes), SUM(files) FROM storage_usage GROUP BY device_id"
+        )
+
+def get_device_storage(db_name):
+    """Liste les (appareil, octets, fichiers) de l'index"""
+    conn = get_connection(db_name)
+    return conn.execute("SELECT device_id, bytes, files FROM storage_devices").fetchall()
+
+def get_top_storage(db_name, limit=10):
+    """Appareils utilisant le plus d'espace (parcours de l'index sur bytes, sans tri)"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT device_id, bytes, files FROM storage_devices ORDER BY bytes DESC LIMIT ?",
+        (limit,)
+    ).fetchall()
+
+def get_category_storage(db_name, device_id):
+    """Espace utilisé par catégorie pour un appareil, du plus grand au plus petit"""
+    conn = get_connection(db_name)
+    return conn.execute(
+        "SELECT category, bytes, files FROM storage_usage WHERE device_id = ? ORDER BY bytes DESC",
+        (device_id,)
+    ).fetchall()
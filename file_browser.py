@@ -0,0 +1,137 @@
+# file_browser.py
+import base64
+import hashlib
+import os
+from bisect import bisect_left
+from collections import OrderedDict
+from datetime import datetime
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+import file_manager
+from config import FILE_PAGE_SIZE, LISTING_CACHE_SIZE
+
+# Tris proposés : nom (A→Z), date (plus récents d'abord), taille (plus gros d'abord)
+SORTS = {'n': ("🔤 Nom", "nom"), 'd': ("🕐 Date", "date"), 's': ("📦 Taille", "taille")}
+
+# Longueur maximale du nom affiché sur un bouton
+MAX_LABEL = 40
+
+def short_id(text):
+    """Identifiant court et stable (8 caractères) d'un chemin ou d'un nom de fichier"""
+    digest = hashlib.blake2b(text.encode('utf-8', 'surrogateescape'), digest_size=6).digest()
+    return base64.urlsafe_b64encode(digest).decode('ascii')
+
+def _fold(name):
+    return name.casefold()
+
+class FolderIndex:
+    """Index trié d'un dossier : tailles et dates relevées une fois par fichier, ordres calculés à la demande"""
+
+    __slots__ = ('files', 'stats', 'by_id', '_orders', '_keys')
+
+    def __init__(self, directory, files, previous=None):
+        self.files = files
+        self.stats = {}  # nom -> (taille, mtime)
+        known = previous.stats if previous is not None else {}
+        for name in files:
+            stat = known.get(name)
+            if stat is None:
+                try:
+                    st = os.stat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue
+                stat = (st.st_size, st.st_mtime)
+            self.stats[name] = stat
+        self.by_id = {short_id(name): name for name in self.stats}
+        self._orders = {}
+        self._keys = None
+
+    def order(self, sort):
+        """Noms triés selon `sort` (calculé une fois par version du dossier)"""
+        names = self._orders.get(sort)
+        if names is None:
+            if sort == 'd':
+                names = sorted(self.stats, key=lambda n: (-self.stats[n][1], _fold(n)))
+            elif sort == 's':
+                names = sorted(self.stats, key=lambda n: (-self.stats[n][0], _fold(n)))
+            else:
+                names = sorted(self.stats, key=_fold)
+                self._keys = [_fold(n) for n in names]
+            self._orders[sort] = names
+        return names
+
+    def search(self, prefix, sort):
+        """Noms commençant par `prefix` (sans tenir compte de la casse), dans l'ordre `sort`"""
+        by_name = self.order('n')
+        prefix = _fold(prefix)
+        start = bisect_left(self._keys, prefix)
+        end = bisect_left(self._keys, prefix + '\U0010ffff', start)
+        if sort == 'n':
+            return by_name[start:end]
+        matches = set(by_name[start:end])
+        return [name for name in self.order(sort) if name in matches]
+
+# Index par dossier (LRU), reconstruit quand file_manager renvoie une nouvelle liste
+_indexes = OrderedDict()
+
+def folder_index(directory):
+    """Index du dossier, à partir de la liste en cache de file_manager (sans relire le dossier)"""
+    files = file_manager.list_files(directory)
+    index = _indexes.get(directory)
+    if index is None or index.files is not files:
+        index = FolderIndex(directory, files, previous=index)
+        _indexes[directory] = index
+    _indexes.move_to_end(directory)
+    if len(_indexes) > LISTING_CACHE_SIZE:
+        _indexes.popitem(last=False)
+    return index
+
+def resolve(directory, file_id):
+    """Nom du fichier correspondant à un identifiant court, ou None"""
+    return folder_index(directory).by_id.get(file_id)
+
+def _label(name, stat, sort):
+    if len(name) > MAX_LABEL:
+        name = name[:MAX_LABEL - 1] + '…'
+    if sort == 'd':
+        return f"{name} · {datetime.fromtimestamp(stat[1]).strftime('%d/%m/%Y %H:%M')}"
+    return f"{name} · {file_manager.format_size(stat[0])}"
+
+def build_page(directory, title, sort='n', page=0, prefix=None):
+    """Construit le texte et le clavier en ligne d'une page du dossier.
+
+    Données de rappel : fb:f:<dossier>:<fichier> pour ouvrir un fichier,
+    fb:p:<dossier>:<tri>:<page>:<recherche 0/1> pour changer de page ou de tri.
+    """
+    if sort not in SORTS:
+        sort = 'n'
+    index = folder_index(directory)
+    names = index.search(prefix, sort) if prefix else index.order(sort)
+    pages = max(1, -(-len(names) // FILE_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    folder = short_id(directory)
+    searching = '1' if prefix else '0'
+
+    if prefix:
+        header = f"🔍 {len(names)} fichier(s) commençant par « {prefix} » dans {title}"
+    else:
+        header = f"📂 {len(names)} fichier(s) dans {title}"
+    if not names:
+        return header + ".", None
+
+    rows = [
+        [InlineKeyboardButton(_label(name, index.stats[name], sort), callback_data=f"fb:f:{folder}:{short_id(name)}")]
+        for name in names[page * FILE_PAGE_SIZE:(page + 1) * FILE_PAGE_SIZE]
+    ]
+    if pages > 1:
+        navigation = []
+        if page > 0:
+            navigation.append(InlineKeyboardButton("⬅️", callback_data=f"fb:p:{folder}:{sort}:{page - 1}:{searching}"))
+        navigation.append(InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="fb:x"))
+        if page < pages - 1:
+            navigation.append(InlineKeyboardButton("➡️", callback_data=f"fb:p:{folder}:{sort}:{page + 1}:{searching}"))
+        rows.append(navigation)
+    rows.append([
+        InlineKeyboardButton(("✅ " if key == sort else "") + label, callback_data=f"fb:p:{folder}:{key}:0:{searching}")
+        for key, (label, _) in SORTS.items()
+    ])
+    return f"{header} — page {page + 1}/{pages}, tri : {SORTS[sort][1]}", InlineKeyboardMarkup(rows)
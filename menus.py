@@ -0,0 +1,177 @@
+# menus.py
+from types import MappingProxyType
+from telegram import ReplyKeyboardMarkup, ReplyKeyboardRemove
+
+# Structure complète du menu
+MENU_STRUCTURE = {
+    "📱 SMS/MMS": {
+        "folder": "sms_mms",
+        "submenu": [
+            "Suivi des SMS et MMS",
+            "Alerte SMS"
+        ]
+    },
+    "📞 Appels": {
+        "folder": "appels",
+        "submenu": [
+            "Suivi des journaux d'appels",
+            "Enregistrement des appels",
+            "Blocage des appels"
+        ]
+    },
+    "📍 Localisation": {
+        "folder": "localisations",
+        "submenu": [
+            "Historique des positions GPS",
+            "Suivi en temps réel"
+        ]
+    },
+    "🖼️ Photos & Vidéos": {
+        "folder": "photos",
+        "submenu": [
+            "Visualiser les photos et images"
+        ]
+    },
+    "💬 Messagerie instantanée": {
+        "folder": "messageries",
+        "submenu": [
+            "WhatsApp", "Facebook Messenger", "Skype", "Hangouts", "LINE",
+            "Kik", "Viber", "Gmail", "Tango", "Snapchat", "Telegram"
+        ]
+    },
+    "🎙️ Contrôle à distance": {
+        "folder": "controle_distance",
+        "submenu": [
+            "Enregistrement audio",
+            "Prendre une photo",
+            "Commande SMS",
+            "Faire vibrer/sonner",
+            "Envoyer message vocal",
+            "Envoyer popup texte",
+            "Envoyer SMS externe",
+            "Position GPS",
+            "Capture d'écran",
+            "Récupérer données",
+            "Info téléphone",
+            "Cacher/Voir icône",
+            "Activer/Désactiver Wi-Fi",
+            "Redémarrer téléphone",
+            "Formater téléphone",
+            "Bloquer téléphone"
+        ]
+    },
+    "📺 Visualisation en direct": {
+        "folder": "visualisation_directe",
+        "submenu": [
+            "Audio/Vidéo/Screen"
+        ]
+    },
+    "📁 Gestionnaire de fichiers": {
+        "folder": "fichiers",
+        "submenu": [
+            "Explorateur de fichiers"
+        ]
+    },
+    "⏱ Restriction d'horaire": {
+        "folder": "restrictions",
+        "submenu": [
+            "Restreindre utilisation"
+        ]
+    },
+    "📱 Applications": {
+        "folder": "applications",
+        "submenu": [
+            "Suivi applications installées",
+            "Blocage des applications"
+        ]
+    },
+    "🌐 Sites Web": {
+        "folder": "sites_web",
+        "submenu": [
+            "Historique des sites",
+            "Blocage des sites"
+        ]
+    },
+    "📅 Calendrier": {
+        "folder": "calendrier",
+        "submenu": [
+            "Historique des événements"
+        ]
+    },
+    "👤 Contacts": {
+        "folder": "contacts",
+        "submenu": [
+            "Suivi des nouveaux contacts"
+        ]
+    },
+    "📊 Outils d'analyse": {
+        "folder": "analyse",
+        "submenu": [
+            "Statistiques",
+            "Rapport PDF/Excel/CSV"
+        ]
+    }
+}
+
+# Boutons de navigation
+BACK_TO_CATEGORIES = "⬅️ Retour aux catégories"
+BACK_TO_MAIN = "⬅️ Retour au menu principal"
+UPLOAD_BUTTON = "⬆️ Télécharger un fichier"
+STATS_BUTTON = "📈 Statistiques"
+
+MAIN_CATEGORY_KEYBOARD = [
+    ["📱 SMS/MMS", "📞 Appels", "📍 Localisation"],
+    ["🖼️ Photos & Vidéos", "💬 Messagerie instantanée", "🎙️ Contrôle à distance"],
+    ["📺 Visualisation en direct", "📁 Gestionnaire de fichiers", "⏱ Restriction d'horaire"],
+    ["📱 Applications", "🌐 Sites Web", "📅 Calendrier"],
+    ["👤 Contacts", "📊 Outils d'analyse", "📋 Retour"]
+]
+
+ADMIN_KEYBOARD = [
+    ["📋 Liste des cibles", "🗑️ Supprimer une cible"],
+    [STATS_BUTTON, "📤 Exporter les logs"],
+    ["📊 Tableau de bord", BACK_TO_MAIN]
+]
+
+# Options du panel admin (hors retour au menu principal)
+ADMIN_BUTTONS = frozenset(button for row in ADMIN_KEYBOARD for button in row) - {BACK_TO_MAIN}
+
+class CompiledKeyboard(ReplyKeyboardMarkup):
+    """Clavier figé dont la forme sérialisée est calculée une seule fois"""
+
+    __slots__ = ('_serialized',)
+
+    def __init__(self, keyboard):
+        super().__init__(keyboard, resize_keyboard=True)
+        with self._unfrozen():
+            self._serialized = super().to_dict()
+
+    def to_dict(self, recursive=True):
+        return self._serialized
+
+def subfolder_name(subcategory):
+    """Nom du sous-dossier d'une sous-catégorie"""
+    return "".join(filter(str.isalnum, subcategory)).lower()[:20]
+
+def _compile(structure):
+    """Catégorie -> (dossier, sous-menu) et (catégorie, sous-catégorie) -> (dossier, sous-dossier)"""
+    categories = {}
+    subcategories = {}
+    for category, data in structure.items():
+        submenu = data.get('submenu', [])
+        rows = [submenu[i:i + 2] for i in range(0, len(submenu), 2)]
+        rows.append([BACK_TO_CATEGORIES, BACK_TO_MAIN])
+        categories[category] = (data['folder'], CompiledKeyboard(rows) if submenu else None)
+        for subcategory in submenu:
+            subcategories[(category, subcategory)] = (data['folder'], subfolder_name(subcategory))
+    return MappingProxyType(categories), MappingProxyType(subcategories)
+
+# Construits une seule fois à l'import : les gestionnaires ne font que des recherches
+CATEGORIES, SUBCATEGORIES = _compile(MENU_STRUCTURE)
+
+MAIN_MENU_MARKUP = CompiledKeyboard(MAIN_CATEGORY_KEYBOARD)
+ADMIN_MENU_MARKUP = CompiledKeyboard(ADMIN_KEYBOARD)
+UPLOAD_MARKUP = CompiledKeyboard([[BACK_TO_CATEGORIES, BACK_TO_MAIN]])
+# Les fichiers eux-mêmes sont proposés par l'explorateur en ligne (file_browser)
+FOLDER_MARKUP = CompiledKeyboard([[UPLOAD_BUTTON], [BACK_TO_CATEGORIES, BACK_TO_MAIN]])
+REMOVE_KEYBOARD = ReplyKeyboardRemove()
@@ -0,0 +1,50 @@
+# ordering.py
+import asyncio
+from telegram.ext import Application
+
+class OrderedApplication(Application):
+    """Application traitant les mises à jour de plusieurs utilisateurs en parallèle,
+    mais celles d'un même utilisateur strictement dans l'ordre (états du ConversationHandler).
+    """
+
+    def __init__(self, max_concurrent, **kwargs):
+        super().__init__(**kwargs)
+        self._max_concurrent = asyncio.BoundedSemaphore(max_concurrent)
+        self._user_locks = {}  # clé -> [verrou, mises à jour en attente ou en cours]
+        # Mises à jour retirées de la file mais pas encore traitées (contre-pression du webhook)
+        self.pending_updates = 0
+
+    @staticmethod
+    def _ordering_key(update):
+        """Utilisateur (à défaut conversation) dont l'ordre des mises à jour doit être respecté"""
+        user = getattr(update, 'effective_user', None)
+        if user is not None:
+            return user.id
+        chat = getattr(update, 'effective_chat', None)
+        return chat.id if chat is not None else None
+
+    async def process_update(self, update):
+        self.pending_updates += 1
+        try:
+            await self._process_in_order(update)
+        finally:
+            self.pending_updates -= 1
+
+    async def _process_in_order(self, update):
+        key = self._ordering_key(update)
+        if key is None:
+            async with self._max_concurrent:
+                return await super().process_update(update)
+
+        entry = self._user_locks.get(key)
+        if entry is None:
+            entry = self._user_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            # Verrou de l'utilisateur d'abord : ses mises à jour en attente n'occupent pas de place
+            async with entry[0], self._max_concurrent:
+                await super().process_update(update)
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._user_locks[key]
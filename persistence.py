@@ -0,0 +1,151 @@
+# persistence.py
+import json
+import logging
+import time
+from datetime import datetime
+from telegram.ext import BasePersistence, PersistenceInput
+import async_db
+import database
+from config import DB_NAME, PERSISTENCE_INTERVAL
+
+logger = logging.getLogger(__name__)
+
+def _default(value):
+    if isinstance(value, datetime):
+        return {'__datetime__': value.isoformat()}
+    raise TypeError(f"Type non sérialisable : {type(value).__name__}")
+
+def _object_hook(obj):
+    if len(obj) == 1 and '__datetime__' in obj:
+        return datetime.fromisoformat(obj['__datetime__'])
+    return obj
+
+def encode(value):
+    """Sérialise en JSON compact (datetime compris)"""
+    return json.dumps(value, default=_default, separators=(',', ':'), sort_keys=True, ensure_ascii=False)
+
+def decode(text):
+    """Inverse de encode()"""
+    return json.loads(text, object_hook=_object_hook)
+
+class SQLitePersistence(BasePersistence):
+    """Conserve dans SQLite les données utilisateur et les états des ConversationHandler.
+
+    Une ligne JSON par utilisateur et par conversation, réécrite seulement si son contenu
+    a changé. L'Application appelle les méthodes update_* toutes les `update_interval`
+    secondes, hors du traitement des mises à jour; les écritures passent par le pool de la base.
+    """
+
+    def __init__(self, db_name=DB_NAME, update_interval=PERSISTENCE_INTERVAL):
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, chat_data=False, user_data=True, callback_data=False),
+            update_interval=update_interval
+        )
+        self.db_name = db_name
+        self._written = {}  # user_id ou (nom, clé) -> dernier JSON écrit
+
+    async def get_user_data(self):
+        user_data = {}
+        for user_id, data in await async_db.run(database.get_user_sessions, self.db_name):
+            self._written[user_id] = data
+            user_data[user_id] = decode(data)
+        return user_data
+
+    async def update_user_data(self, user_id, data):
+        try:
+            encoded = encode(data) if data else None
+        except TypeError as e:
+            logger.error(f"Données de l'utilisateur {user_id} non conservées: {e}")
+            return
+        if self._written.get(user_id) == encoded:
+            return
+        self._written[user_id] = encoded
+        if encoded is None:
+            await async_db.run(database.delete_user_session, self.db_name, user_id)
+        else:
+            await async_db.run(database.set_user_session, self.db_name, user_id, encoded)
+
+    async def drop_user_data(self, user_id):
+        self._written.pop(user_id, None)
+        await async_db.run(database.delete_user_session, self.db_name, user_id)
+
+    async def refresh_user_data(self, user_id, user_data):
+        pass  # Un seul processus écrit : les données en mémoire font foi
+
+    async def get_conversations(self, name):
+        conversations = {}
+        for key, state in await async_db.run(database.get_conversations, self.db_name, name):
+            self._written[(name, key)] = state
+            conversations[tuple(json.loads(key))] = json.loads(state)
+        return conversations
+
+    async def update_conversation(self, name, key, new_state):
+        encoded_key = json.dumps(list(key))
+        encoded = None if new_state is None else json.dumps(new_state)
+        if self._written.get((name, encoded_key)) == encoded:
+            return
+        self._written[(name, encoded_key)] = encoded
+        await async_db.run(database.set_conversation, self.db_name, name, encoded_key, encoded)
+
+    # Données de conversation, du bot et des callbacks : non utilisées par ce bot
+    async def get_chat_data(self):
+        return {}
+
+    async def get_bot_data(self):
+        return {}
+
+    async def get_callback_data(self):
+        return None
+
+    async def update_chat_data(self, chat_id, data):
+        pass
+
+    async def update_bot_data(self, data):
+        pass
+
+    async def update_callback_data(self, data):
+        pass
+
+    async def drop_chat_data(self, chat_id):
+        pass
+
+    async def refresh_chat_data(self, chat_id, chat_data):
+        pass
+
+    async def refresh_bot_data(self, bot_data):
+        pass
+
+    async def flush(self):
+        pass  # Chaque modification est écrite dès update_*
+
+async def run_once(job_queue, callback, when, chat_id, user_id, data, db_name=DB_NAME):
+    """Planifie un job ponctuel et l'enregistre pour le reprogrammer après un redémarrage"""
+    job_id = await async_db.run(
+        database.add_pending_job, db_name, callback.__name__, time.time() + when, chat_id, user_id, encode(data)
+    )
+    return job_queue.run_once(
+        callback, when, data={**data, 'pending_job_id': job_id}, chat_id=chat_id, user_id=user_id
+    )
+
+async def job_done(context, db_name=DB_NAME):
+    """Retire de la table des jobs en attente le job en cours d'exécution"""
+    job_id = context.job.data.get('pending_job_id')
+    if job_id is not None:
+        await async_db.run(database.delete_pending_job, db_name, job_id)
+
+async def restore_jobs(job_queue, callbacks, db_name=DB_NAME):
+    """Reprogramme les jobs enregistrés avec leur délai restant; renvoie leur nombre"""
+    callbacks = {callback.__name__: callback for callback in callbacks}
+    rows = await async_db.run(database.list_pending_jobs, db_name)
+    now = time.time()
+    for job_id, name, due, chat_id, user_id, data in rows:
+        callback = callbacks.get(name)
+        if callback is None:
+            logger.warning(f"Job {job_id} ignoré : callback {name} inconnu")
+            await async_db.run(database.delete_pending_job, db_name, job_id)
+            continue
+        job_queue.run_once(
+            callback, max(0, due - now), data={**decode(data), 'pending_job_id': job_id},
+            chat_id=chat_id, user_id=user_id
+        )
+    return len(rows)
@@ -0,0 +1,161 @@
+# report_cache.py
+import json
+import os
+import shutil
+import tempfile
+import time
+import database
+import report_generator
+from config import REPORT_CACHE_QUOTA, PDF_ROWS_PER_VOLUME
+
+# Rapports complets conservés d'un export à l'autre (chemin stable : file_id Telegram réutilisable)
+CACHE_PATH = os.path.join(report_generator.REPORTS_PATH, 'cache')
+
+# Rapport PDF en cache : un dossier avec la synthèse, les volumes et leur manifeste
+SUMMARY_FILE = 'report_resume.pdf'
+MANIFEST = 'manifest.json'
+
+SUFFIXES = {'csv': '_logs.csv', 'pdf': '_report'}
+
+def build(db_name, device_id, format_type):
+    """Retourne le rapport complet et à jour (CSV : un chemin, PDF : liste de fichiers), via le cache.
+
+    Exécuté dans un processus de rapports. Le rapport en cache couvre les logs jusqu'à
+    max_log_id : s'il n'y a rien de nouveau il est servi tel quel. Sinon seule la partie
+    nouvelle est produite : lignes ajoutées au CSV, ou pour le PDF nouvelle synthèse,
+    dernier volume incomplet et volumes suivants (les volumes pleins sont conservés).
+    """
+    high_water = database.get_max_log_id(db_name, device_id)
+    entry = database.get_report_cache(db_name, device_id, format_type)
+    path = os.path.join(CACHE_PATH, f"{device_id}{SUFFIXES[format_type]}")
+
+    cached = None
+    ready = os.path.exists(path if format_type == 'csv' else os.path.join(path, MANIFEST))
+    if entry and entry[0] == path and ready and entry[1] <= high_water:
+        cached = entry[1]
+        if cached == high_water:
+            database.touch_report_cache(db_name, device_id, format_type, time.time())
+            return path if format_type == 'csv' else _pdf_files(path)
+
+    os.makedirs(CACHE_PATH, exist_ok=True)
+    if format_type == 'csv':
+        if cached is not None:
+            _append_csv(db_name, device_id, path, cached, high_water)
+        else:
+            _write_csv(db_name, device_id, path, high_water)
+        result = path
+    else:
+        result = _build_pdf(db_name, device_id, path, high_water, incremental=cached is not None)
+
+    _store(db_name, device_id, format_type, path, high_water)
+    return result
+
+def _write_csv(db_name, device_id, path, up_to_id):
+    fd, tmp_path = tempfile.mkstemp(dir=CACHE_PATH, suffix='.tmp')
+    try:
+        report_generator.write_csv(
+            fd, database.iter_device_logs(db_name, device_id, after_id=0, up_to_id=up_to_id)
+        )
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+def _pdf_files(directory):
+    """Fichiers d'un rapport PDF en cache : synthèse puis volumes"""
+    with open(os.path.join(directory, MANIFEST)) as f:
+        volumes = json.load(f)
+    return [os.path.join(directory, SUMMARY_FILE)] + [os.path.join(directory, v['file']) for v in volumes]
+
+def _render_into(path, render, *args):
+    """Produit un fichier via un fichier temporaire du même dossier, puis le remplace atomiquement"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    os.close(fd)
+    try:
+        render(tmp_path, *args)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    os.replace(tmp_path, path)
+
+def _build_pdf(db_name, device_id, directory, up_to_id, incremental):
+    """Met à jour le rapport PDF en cache : volumes pleins conservés, le reste rendu à nouveau"""
+    volumes = []
+    if incremental:
+        with open(os.path.join(directory, MANIFEST)) as f:
+            volumes = [v for v in json.load(f) if v['rows'] >= PDF_ROWS_PER_VOLUME]
+    else:
+        shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+    after_id = volumes[-1]['last_id'] if volumes else 0
+    chunks = database.iter_device_logs(db_name, device_id, after_id=after_id, up_to_id=up_to_id)
+    for rows in report_generator.iter_volumes(chunks):
+        number = len(volumes) + 1
+        name = f"report_{number:03d}.pdf"
+        _render_into(os.path.join(directory, name), report_generator.render_pdf_volume, device_id, rows, number)
+        volumes.append({'file': name, 'last_id': rows[-1][0], 'rows': len(rows)})
+
+    _render_into(
+        os.path.join(directory, SUMMARY_FILE),
+        lambda filename: report_generator.render_pdf_summary(filename, db_name, device_id, up_to_id=up_to_id)
+    )
+
+    tmp_manifest = os.path.join(directory, MANIFEST + '.tmp')
+    with open(tmp_manifest, 'w') as f:
+        json.dump(volumes, f)
+    os.replace(tmp_manifest, os.path.join(directory, MANIFEST))
+    return _pdf_files(directory)
+
+def _append_csv(db_name, device_id, path, after_id, up_to_id):
+    """Ajoute au CSV en cache les logs d'id dans ]after_id, up_to_id]"""
+    size = os.path.getsize(path)
+    try:
+        report_generator.write_csv(
+            path,
+            database.iter_device_logs(db_name, device_id, after_id=after_id, up_to_id=up_to_id),
+            mode='ab',
+            header=False
+        )
+    except BaseException:
+        # Ne jamais laisser un ajout partiel : il serait dupliqué au prochain export
+        os.truncate(path, size)
+        raise
+
+def _size(path):
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+    return os.path.getsize(path)
+
+def _store(db_name, device_id, format_type, path, max_log_id):
+    database.set_report_cache(
+        db_name, device_id, format_type, path, max_log_id, _size(path), time.time()
+    )
+    evict(db_name, keep=(device_id, format_type))
+
+def evict(db_name, keep=None, quota=REPORT_CACHE_QUOTA):
+    """Supprime les rapports les moins récemment utilisés tant que le cache dépasse le quota"""
+    entries = database.list_report_cache(db_name)
+    total = sum(size or 0 for *_, size in entries)
+    for device_id, format_type, path, size in entries:
+        if total <= quota:
+            break
+        if (device_id, format_type) == keep:
+            continue
+        _remove(db_name, device_id, format_type, path)
+        total -= size or 0
+
+def forget_device(db_name, device_id):
+    """Supprime les rapports en cache d'un appareil"""
+    for _, format_type, path, _ in database.list_report_cache(db_name, device_id):
+        _remove(db_name, device_id, format_type, path)
+
+def _remove(db_name, device_id, format_type, path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    database.delete_report_cache(db_name, device_id, format_type)
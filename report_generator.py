@@ -1,45 +1,143 @@
 # report_generator.py
 import csv
-import sqlite3
+import gzip
+import io
 import os
+import tempfile
 from reportlab.lib.pagesizes import letter
-from reportlab.platypus import SimpleDocTemplate, Paragraph
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Paragraph, Table, TableStyle
 from reportlab.lib.styles import getSampleStyleSheet
-from config import DB_NAME, DATA_PATH
-
-def generate_csv(db_name, device_id):
-    """Génère un rapport CSV des logs"""
-    filename = os.path.join(DATA_PATH, f"{device_id}_logs.csv")
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("SELECT * FROM logs WHERE device_id=?", (device_id,))
-    
-    with open(filename, 'w', newline='', encoding='utf-8') as f:
+from config import DB_NAME, DATA_PATH, PDF_ROWS_PER_VOLUME
+import database
+
+# Rapports générés (dossier caché : jamais pris pour un appareil)
+REPORTS_PATH = os.path.join(DATA_PATH, '.reports')
+WRITE_BUFFER_SIZE = 256 * 1024
+CSV_HEADER = ['ID', 'Device ID', 'Action', 'File Path', 'Timestamp']
+
+# Mise en page PDF : colonnes de largeur fixe (pas de calcul de largeur par cellule)
+PDF_ROWS_PER_TABLE = 250
+PDF_TABLE_HEADER = ['Date', 'Action', 'Fichier']
+PDF_COLUMN_WIDTHS = [100, 70, 370]
+PDF_PATH_MAX_CHARS = 95
+PDF_TABLE_STYLE = TableStyle([
+    ('FONTSIZE', (0, 0), (-1, -1), 7),
+    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),
+    ('GRID', (0, 0), (-1, -1), 0.25, colors.grey),
+    ('TOPPADDING', (0, 0), (-1, -1), 1),
+    ('BOTTOMPADDING', (0, 0), (-1, -1), 1),
+])
+
+def _new_report_file(device_id, suffix):
+    """Crée un fichier de rapport au nom unique (deux exports simultanés ne se chevauchent pas)"""
+    os.makedirs(REPORTS_PATH, exist_ok=True)
+    return tempfile.mkstemp(dir=REPORTS_PATH, prefix=f"{device_id}_", suffix=suffix)
+
+def write_csv(file, chunks, mode='wb', compress=False, header=True):
+    """Écrit des blocs de lignes de logs dans un fichier CSV (chemin ou descripteur), en flux"""
+    raw = open(file, mode, buffering=WRITE_BUFFER_SIZE)
+    binary = gzip.GzipFile(fileobj=raw, mode='wb', compresslevel=6) if compress else raw
+    with raw, binary, io.TextIOWrapper(binary, encoding='utf-8', newline='') as f:
         writer = csv.writer(f)
-        writer.writerow(['ID', 'Device ID', 'Action', 'File Path', 'Timestamp'])
-        writer.writerows(c.fetchall())
-    
-    conn.close()
+        if header:
+            writer.writerow(CSV_HEADER)
+        for rows in chunks:
+            writer.writerows(rows)
+
+def generate_csv(db_name, device_id, since=None, until=None, actions=None, compress=False):
+    """Génère un rapport CSV des logs, en flux, éventuellement compressé en gzip"""
+    fd, filename = _new_report_file(device_id, '_logs.csv.gz' if compress else '_logs.csv')
+    try:
+        write_csv(fd, database.iter_device_logs(db_name, device_id, since, until, actions), compress=compress)
+    except BaseException:
+        os.unlink(filename)
+        raise
     return filename
 
-def generate_pdf(db_name, device_id):
-    """Génère un rapport PDF des logs"""
-    filename = os.path.join(DATA_PATH, f"{device_id}_report.pdf")
-    conn = sqlite3.connect(db_name)
-    c = conn.cursor()
-    c.execute("SELECT * FROM logs WHERE device_id=?", (device_id,))
-    logs = c.fetchall()
-    conn.close()
+def iter_volumes(chunks, rows_per_volume=PDF_ROWS_PER_VOLUME):
+    """Regroupe des blocs de lignes en volumes d'au plus rows_per_volume lignes"""
+    volume = []
+    for rows in chunks:
+        for row in rows:
+            volume.append(row)
+            if len(volume) >= rows_per_volume:
+                yield volume
+                volume = []
+    if volume:
+        yield volume
+
+def _short_path(path):
+    """Tronque un chemin par la gauche pour tenir dans la colonne"""
+    if not path:
+        return 'Aucun fichier'
+    return path if len(path) <= PDF_PATH_MAX_CHARS else '…' + path[-(PDF_PATH_MAX_CHARS - 1):]
+
+def _new_document(filename):
+    return SimpleDocTemplate(
+        filename, pagesize=letter,
+        leftMargin=36, rightMargin=36, topMargin=36, bottomMargin=36
+    )
+
+def render_pdf_volume(filename, device_id, rows, number):
+    """Écrit un volume du rapport : tableaux de taille fixe, sans Paragraph par ligne"""
+    styles = getSampleStyleSheet()
+    story = [Paragraph(f"Rapport d'activité pour {device_id} — volume {number}", styles['Title'])]
+    
+    # Plusieurs petits tableaux plutôt qu'un seul : mise en page rapide et mémoire bornée
+    for start in range(0, len(rows), PDF_ROWS_PER_TABLE):
+        data = [PDF_TABLE_HEADER]
+        data.extend(
+            (log[4], log[2], _short_path(log[3]))
+            for log in rows[start:start + PDF_ROWS_PER_TABLE]
+        )
+        table = Table(data, colWidths=PDF_COLUMN_WIDTHS, repeatRows=1)
+        table.setStyle(PDF_TABLE_STYLE)
+        story.append(table)
     
-    doc = SimpleDocTemplate(filename, pagesize=letter)
+    _new_document(filename).build(story)
+
+def render_pdf_summary(filename, db_name, device_id, since=None, until=None, actions=None, up_to_id=None):
+    """Écrit la synthèse du rapport : nombre de logs par action et par jour (agrégés en SQL)"""
     styles = getSampleStyleSheet()
-    story = [Paragraph(f"Rapport d'activité pour {device_id}", styles['Title'])]
+    story = [Paragraph(f"Rapport d'activité pour {device_id} — synthèse", styles['Title'])]
     
-    for log in logs:
-        story.append(Paragraph(
-            f"{log[4]}: {log[2]} - {log[3] or 'Aucun fichier'}",
-            styles['BodyText']
-        ))
+    for title, group_by, header in (("Par action", 'action', "Action"), ("Par jour", 'day', "Jour")):
+        counts = database.count_device_logs(db_name, device_id, group_by, since, until, actions, up_to_id)
+        story.append(Paragraph(title, styles['Heading2']))
+        if not counts:
+            story.append(Paragraph("Aucun log.", styles['BodyText']))
+            continue
+        data = [[header, "Nombre"]]
+        data.extend((key or '-', count) for key, count in counts)
+        table = Table(data, colWidths=[200, 100], repeatRows=1)
+        table.setStyle(PDF_TABLE_STYLE)
+        story.append(table)
     
-    doc.build(story)
-    return filename
+    _new_document(filename).build(story)
+
+def generate_pdf(db_name, device_id, since=None, until=None, actions=None, summary_only=False):
+    """Génère un rapport PDF des logs : une synthèse puis des volumes de PDF_ROWS_PER_VOLUME lignes.
+
+    Renvoie la liste des fichiers produits (synthèse en premier).
+    """
+    filenames = []
+    try:
+        fd, filename = _new_report_file(device_id, '_report_resume.pdf')
+        os.close(fd)
+        filenames.append(filename)
+        render_pdf_summary(filename, db_name, device_id, since, until, actions)
+        
+        if not summary_only:
+            chunks = database.iter_device_logs(db_name, device_id, since, until, actions)
+            for number, rows in enumerate(iter_volumes(chunks), start=1):
+                fd, filename = _new_report_file(device_id, f'_report_{number:03d}.pdf')
+                os.close(fd)
+                filenames.append(filename)
+                render_pdf_volume(filename, device_id, rows, number)
+    except BaseException:
+        for filename in filenames:
+            os.unlink(filename)
+        raise
+    return filenames
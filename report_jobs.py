@@ -0,0 +1,79 @@
+# report_jobs.py
+import asyncio
+import functools
+import logging
+import multiprocessing
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+import report_cache
+import report_generator
+from config import REPORT_WORKERS, REPORT_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+# Formats disponibles : (fonction de génération, suffixe du fichier envoyé)
+FORMATS = {
+    'csv': (report_generator.generate_csv, '_logs.csv'),
+    'pdf': (report_generator.generate_pdf, '_report.pdf'),
+}
+
+class TooManyJobs(Exception):
+    """Trop de rapports sont déjà en attente"""
+
+_executor = None
+_jobs = {}
+_inflight = {}  # (base, appareil, format) -> (job_id, future) des rapports complets en cours
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        # 'spawn' : aucun état (connexions SQLite, threads) hérité du processus du bot
+        _executor = ProcessPoolExecutor(
+            max_workers=REPORT_WORKERS,
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _executor
+
+def submit(format_type, db_name, device_id, **options):
+    """Lance la génération d'un rapport dans un processus séparé; renvoie (job_id, future asyncio).
+
+    Sans option, le rapport complet passe par le cache (report_cache) et une demande
+    identique déjà en cours est partagée. Sinon `options` est transmis au générateur
+    (since, until, actions, compress pour le CSV) et produit un fichier temporaire.
+    """
+    key = None if options else (db_name, device_id, format_type)
+    if key in _inflight:
+        return _inflight[key]
+
+    if len(_jobs) >= REPORT_MAX_PENDING:
+        raise TooManyJobs()
+
+    if key:
+        task = functools.partial(report_cache.build, db_name, device_id, format_type)
+    else:
+        builder, _ = FORMATS[format_type]
+        task = functools.partial(builder, db_name, device_id, **options)
+
+    job_id = uuid.uuid4().hex[:8]
+    future = asyncio.wrap_future(_get_executor().submit(task))
+    _jobs[job_id] = future
+    if key:
+        _inflight[key] = (job_id, future)
+
+    def _done(_):
+        _jobs.pop(job_id, None)
+        if key:
+            _inflight.pop(key, None)
+
+    future.add_done_callback(_done)
+    logger.info(f"Rapport {job_id} ({format_type}) lancé pour {device_id}")
+    return job_id, future
+
+def pending_count():
+    """Nombre de rapports en cours ou en attente"""
+    return len(_jobs)
+
+def shutdown():
+    """Annule les rapports en attente et arrête les processus"""
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,222 @@
+# sender.py
+import asyncio
+import heapq
+import itertools
+import logging
+import random
+import time
+from collections import Counter
+import telegram.error
+from config import (
+    SEND_DEADLINE, SEND_BACKOFF_BASE, SEND_BACKOFF_MAX,
+    SEND_GLOBAL_RATE, SEND_CHAT_RATE, SEND_CHAT_BURST
+)
+
+logger = logging.getLogger(__name__)
+
+# Priorités d'envoi : les menus et réponses passent avant les envois de documents
+INTERACTIVE, BULK = 0, 1
+
+# Au-delà, les seaux des conversations inactives sont oubliés
+MAX_CHAT_BUCKETS = 1024
+
+# Compteurs des envois : appels, reprises, limitations Telegram (RetryAfter), échecs définitifs
+stats = Counter()
+
+class TokenBucket:
+    """Seau à jetons : `rate` jetons par seconde, au plus `burst` en réserve"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now):
+        """Délai avant qu'un jeton soit disponible (0 s'il l'est déjà)"""
+        self._refill(now)
+        return max(self.blocked_until - now, (1 - self.tokens) / self.rate, 0)
+
+    def take(self):
+        self.tokens -= 1
+
+    def pause(self, seconds):
+        """Bloque le seau (limitation imposée par Telegram)"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.burst and self.blocked_until <= now
+
+class RateLimiter:
+    """Ordonnance les envois : un seau global, un seau par conversation, priorité aux messages interactifs"""
+
+    def __init__(self, global_rate=SEND_GLOBAL_RATE, chat_rate=SEND_CHAT_RATE, chat_burst=SEND_CHAT_BURST):
+        self.global_bucket = TokenBucket(global_rate, max(1, global_rate))
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._chats = {}
+        self._waiting = []  # Tas de (priorité, ordre d'arrivée, conversation, future)
+        self._seq = itertools.count()
+        self._wakeup = None
+        self._task = None
+        # Métriques : profondeur maximale de la file, attentes par priorité (nombre, total, max)
+        self.max_depth = 0
+        self.waits = {INTERACTIVE: [0, 0.0, 0.0], BULK: [0, 0.0, 0.0]}
+
+    def _chat_bucket(self, chat):
+        bucket = self._chats.get(chat)
+        if bucket is None:
+            if len(self._chats) >= MAX_CHAT_BUCKETS:
+                now = time.monotonic()
+                for key in [k for k, b in self._chats.items() if b.idle(now)]:
+                    del self._chats[key]
+            bucket = self._chats[chat] = TokenBucket(self.chat_rate, self.chat_burst)
+        return bucket
+
+    def _try_take(self, chat, now):
+        """Prend un jeton global et un jeton de la conversation; sinon renvoie le délai d'attente"""
+        buckets = [self.global_bucket] if chat is None else [self.global_bucket, self._chat_bucket(chat)]
+        wait = max(bucket.wait_time(now) for bucket in buckets)
+        if wait == 0:
+            for bucket in buckets:
+                bucket.take()
+        return wait
+
+    async def acquire(self, chat=None, priority=INTERACTIVE):
+        """Attend l'autorisation d'envoyer un message dans une conversation"""
+        start = time.monotonic()
+        if self._waiting or self._try_take(chat, start):
+            loop = asyncio.get_running_loop()
+            future = loop.create_future()
+            heapq.heappush(self._waiting, (priority, next(self._seq), chat, future))
+            self.max_depth = max(self.max_depth, len(self._waiting))
+            if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+                self._wakeup = asyncio.Event()
+                self._task = loop.create_task(self._dispatch())
+            self._wakeup.set()
+            await future
+
+        waited = time.monotonic() - start
+        waits = self.waits[priority]
+        waits[0] += 1
+        waits[1] += waited
+        waits[2] = max(waits[2], waited)
+
+    async def _dispatch(self):
+        """Attribue les jetons aux envois en attente, par priorité puis par ordre d'arrivée"""
+        while True:
+            self._wakeup.clear()
+            now = time.monotonic()
+            delay = None
+            blocked = []
+            while self._waiting:
+                entry = heapq.heappop(self._waiting)
+                _, _, chat, future = entry
+                if future.done():
+                    continue  # Appelant annulé
+                wait = self._try_take(chat, now)
+                if wait == 0:
+                    future.set_result(None)
+                    continue
+                blocked.append(entry)
+                delay = wait if delay is None else min(delay, wait)
+                if self.global_bucket.wait_time(now):
+                    break  # Plus de jeton global : les suivants attendront leur tour
+            for entry in blocked:
+                heapq.heappush(self._waiting, entry)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), delay)
+            except asyncio.TimeoutError:
+                pass
+
+    def pause(self, chat, seconds):
+        """Suspend les envois vers une conversation (ou tous si chat est None)"""
+        bucket = self.global_bucket if chat is None else self._chat_bucket(chat)
+        bucket.pause(seconds)
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    def metrics(self):
+        """Profondeur de la file et temps d'attente moyen/maximal par priorité"""
+        result = {'depth': len(self._waiting), 'max_depth': self.max_depth}
+        for priority, name in ((INTERACTIVE, 'interactive'), (BULK, 'bulk')):
+            count, total, longest = self.waits[priority]
+            result[name] = {
+                'sent': count,
+                'avg_wait': round(total / count, 3) if count else 0,
+                'max_wait': round(longest, 3)
+            }
+        return result
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+limiter = RateLimiter()
+
+def _backoff(attempt):
+    """Délai exponentiel avec gigue complète avant la tentative suivante"""
+    return random.uniform(0, min(SEND_BACKOFF_MAX, SEND_BACKOFF_BASE * 2 ** attempt))
+
+async def call(func, *args, chat=None, priority=INTERACTIVE, deadline=SEND_DEADLINE, **kwargs):
+    """Appelle l'API Telegram avec limitation de débit et reprises; lève la dernière erreur si le délai maximal est dépassé.
+
+    chat est la conversation destinataire (None : seul le débit global s'applique).
+    func est rappelée à chaque tentative : un envoi de fichier doit rouvrir le fichier
+    lui-même (telegram_files.send_document, telegram_files.send_file).
+    """
+    stats['calls'] += 1
+    limit = time.monotonic() + deadline
+    attempt = 0
+    while True:
+        await limiter.acquire(chat, priority)
+        try:
+            return await func(*args, **kwargs)
+        except telegram.error.RetryAfter as e:
+            # Limitation de débit : suspendre la conversation pendant le délai imposé par Telegram
+            stats['retry_after'] += 1
+            limiter.pause(chat, e.retry_after)
+            error, delay = e, e.retry_after
+        except telegram.error.BadRequest:
+            raise  # Requête refusée : une nouvelle tentative échouerait de la même façon
+        except telegram.error.NetworkError as e:  # Inclut TimedOut
+            error, delay = e, _backoff(attempt)
+
+        attempt += 1
+        if time.monotonic() + delay > limit:
+            stats['failures'] += 1
+            raise error
+        stats['retries'] += 1
+        logger.warning(f"{type(error).__name__} lors de l'envoi, tentative {attempt + 1} dans {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+async def safe(func, *args, **kwargs):
+    """Comme call(), mais journalise l'échec et renvoie None au lieu de lever"""
+    try:
+        return await call(func, *args, **kwargs)
+    except telegram.error.TelegramError as e:
+        logger.error(f"Échec de l'envoi à Telegram: {e}")
+        return None
+
+async def reply(update, text, **kwargs):
+    """Répond au message de l'utilisateur; renvoie None si l'envoi a échoué"""
+    return await safe(update.effective_message.reply_text, text, chat=update.effective_chat.id, **kwargs)
+
+async def send_message(bot, chat_id, text, **kwargs):
+    """Envoie un message dans une conversation; renvoie None si l'envoi a échoué"""
+    return await safe(bot.send_message, chat=chat_id, chat_id=chat_id, text=text, **kwargs)
+
+async def delete_message(bot, chat_id, message_id):
+    """Supprime un message; renvoie None si la suppression a échoué"""
+    return await safe(bot.delete_message, chat=chat_id, chat_id=chat_id, message_id=message_id)
+
+def report():
+    """Compteurs et métriques de la file d'envoi, pour le journal"""
+    return {**stats, **limiter.metrics()}
@@ -0,0 +1,118 @@
+# storage_usage.py
+import os
+import async_db
+import database
+import file_manager
+from config import DATA_PATH, DB_NAME, STORAGE_DEVICE_QUOTA, STORAGE_GLOBAL_QUOTA
+
+# Dossier hors index : activity.log est modifié en place à chaque activité
+EXCLUDED_FOLDERS = {'logs'}
+
+class QuotaExceeded(Exception):
+    """Le fichier dépasserait le quota d'un appareil ou le quota global"""
+
+# Copie en mémoire des totaux par appareil (octets, fichiers), tenue à jour avec la base :
+# les quotas sont vérifiés sans requête
+_devices = {}
+_total = 0
+
+def load(db_name=DB_NAME):
+    """Charge les totaux par appareil depuis la base; renvoie le nombre d'appareils indexés"""
+    global _total
+    rows = database.get_device_storage(db_name)
+    _devices.clear()
+    _devices.update((device_id, (size, files)) for device_id, size, files in rows)
+    _total = sum(size for size, _ in _devices.values())
+    return len(_devices)
+
+def locate(path, data_path=DATA_PATH):
+    """(appareil, catégorie) d'un fichier sous le dossier des données"""
+    parts = os.path.relpath(path, data_path).split(os.sep)
+    return parts[0], parts[1] if len(parts) > 2 else ''
+
+def usage(device_id=None):
+    """(octets, fichiers) d'un appareil, ou octets utilisés au total"""
+    if device_id is None:
+        return _total
+    return _devices.get(device_id, (0, 0))
+
+def check_quota(device_id, size):
+    """Lève QuotaExceeded si `size` octets de plus dépassent le quota de l'appareil ou le quota global"""
+    if STORAGE_DEVICE_QUOTA and _devices.get(device_id, (0, 0))[0] + size > STORAGE_DEVICE_QUOTA:
+        raise QuotaExceeded(f"quota de la cible atteint ({file_manager.format_size(STORAGE_DEVICE_QUOTA)})")
+    if STORAGE_GLOBAL_QUOTA and _total + size > STORAGE_GLOBAL_QUOTA:
+        raise QuotaExceeded(f"espace de stockage du bot plein ({file_manager.format_size(STORAGE_GLOBAL_QUOTA)})")
+
+async def record(path, size, db_name=DB_NAME):
+    """Compte un fichier ajouté dans l'index (copie en mémoire puis base)"""
+    global _total
+    device_id, category = locate(path)
+    device_size, device_files = _devices.get(device_id, (0, 0))
+    _devices[device_id] = (device_size + size, device_files + 1)
+    _total += size
+    await async_db.run(database.add_storage_usage, db_name, device_id, category, size)
+
+async def forget(device_id, db_name=DB_NAME):
+    """Retire de l'index un appareil supprimé"""
+    global _total
+    device_size, _ = _devices.pop(device_id, (0, 0))
+    _total -= device_size
+    await async_db.run(database.delete_storage_usage, db_name, device_id)
+
+def _scan_tree(directory):
+    size = files = 0
+    stack = [directory]
+    while stack:
+        try:
+            with os.scandir(stack.pop()) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    elif entry.is_file(follow_symlinks=False):
+                        size += entry.stat(follow_symlinks=False).st_size
+                        files += 1
+        except FileNotFoundError:
+            pass  # Supprimé pendant le parcours
+    return size, files
+
+def scan(device_ids, data_path=DATA_PATH):
+    """Mesure sur le disque les (appareil, catégorie, octets, fichiers) des appareils donnés"""
+    rows = []
+    for device_id in device_ids:
+        try:
+            with os.scandir(os.path.join(data_path, device_id)) as entries:
+                categories = [
+                    entry for entry in entries
+                    if entry.is_dir(follow_symlinks=False) and entry.name not in EXCLUDED_FOLDERS
+                ]
+        except FileNotFoundError:
+            continue
+        for entry in categories:
+            size, files = _scan_tree(entry.path)
+            if files:
+                rows.append((device_id, entry.name, size, files))
+    return rows
+
+def _rebuild(device_ids, db_name, data_path):
+    rows = scan(device_ids, data_path)
+    database.replace_storage_usage(db_name, rows)
+    devices = {}
+    for device_id, _, size, files in rows:
+        device_size, device_files = devices.get(device_id, (0, 0))
+        devices[device_id] = (device_size + size, device_files + files)
+    return devices
+
+async def reconcile(device_ids, db_name=DB_NAME, data_path=DATA_PATH):
+    """Recalcule l'index depuis le disque; renvoie l'écart corrigé en octets.
+
+    Un fichier reçu pendant le parcours peut être compté ou non : l'écart éventuel
+    est corrigé au passage suivant.
+    """
+    global _total
+    devices = await async_db.run(_rebuild, device_ids, db_name, data_path)
+    total = sum(size for size, _ in devices.values())
+    drift = total - _total
+    _devices.clear()
+    _devices.update(devices)
+    _total = total
+    return drift
@@ -0,0 +1,51 @@
+# telegram_files.py
+import logging
+import os
+import telegram.error
+import async_db
+import database
+from config import DB_NAME
+
+logger = logging.getLogger(__name__)
+
+async def send_document(bot, chat_id, file_path, filename=None, db_name=DB_NAME, **kwargs):
+    """Envoie un fichier en réutilisant son file_id Telegram s'il n'a pas changé depuis le dernier envoi"""
+    stat = os.stat(file_path)
+    cached = await async_db.run(database.get_telegram_file, db_name, file_path)
+
+    if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+        try:
+            return await bot.send_document(chat_id=chat_id, document=cached[2], **kwargs)
+        except telegram.error.BadRequest as e:
+            # file_id expiré ou invalide : renvoyer les octets
+            logger.warning(f"file_id en cache refusé pour {file_path}: {e}")
+            await async_db.run(database.delete_telegram_files, db_name, file_path)
+
+    with open(file_path, 'rb') as f:
+        message = await bot.send_document(
+            chat_id=chat_id,
+            document=f,
+            filename=filename or os.path.basename(file_path),
+            **kwargs
+        )
+
+    if message.document:
+        await async_db.run(
+            database.set_telegram_file, db_name, file_path,
+            stat.st_mtime_ns, stat.st_size, message.document.file_id
+        )
+    return message
+
+async def send_file(bot, chat_id, file_path, filename=None, **kwargs):
+    """Envoie un fichier temporaire sans mémoriser son file_id (rouvert à chaque appel)"""
+    with open(file_path, 'rb') as f:
+        return await bot.send_document(
+            chat_id=chat_id,
+            document=f,
+            filename=filename or os.path.basename(file_path),
+            **kwargs
+        )
+
+async def forget(path, db_name=DB_NAME):
+    """Oublie les file_id d'un fichier ou d'un dossier supprimé"""
+    await async_db.run(database.delete_telegram_files, db_name, path)
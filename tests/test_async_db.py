@@ -0,0 +1,71 @@
+# tests/test_async_db.py
+# Vérifie qu'une écriture lente dans le pool d'async_db ne bloque pas la boucle asyncio.
+# Lancement : python -m pytest tests  ou  python tests/test_async_db.py
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Configuration minimale avant l'import de config (base et données dans un dossier temporaire)
+_tmp = tempfile.mkdtemp(prefix='mdm_test_')
+os.environ.setdefault('BOT_TOKEN', 'test')
+os.environ.setdefault('BOT_PASSWORD', 'test')
+os.environ.setdefault('DATA_PATH', os.path.join(_tmp, 'data'))
+os.environ.setdefault('DB_NAME', os.path.join(_tmp, 'test.db'))
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import async_db
+import database
+from config import DB_NAME
+
+SLOW_WRITE = 0.5  # Durée (s) de l'écriture lente simulée
+TICK = 0.01       # Période (s) de la coroutine témoin
+
+def slow_write(db_name):
+    """Écriture bloquante : transaction ouverte pendant SLOW_WRITE secondes"""
+    conn = database.get_connection(db_name)
+    with conn:
+        conn.execute("INSERT INTO devices (id, type) VALUES ('slow', 'sn')")
+        time.sleep(SLOW_WRITE)
+
+async def _measure():
+    database.init_db(DB_NAME)
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    gaps = []
+
+    async def ticker():
+        last = loop.time()
+        while not stop.is_set():
+            await asyncio.sleep(TICK)
+            now = loop.time()
+            gaps.append(now - last)
+            last = now
+
+    async def other_handler():
+        # Travail d'un autre utilisateur pendant l'écriture lente (une autre connexion du pool)
+        start = loop.time()
+        await async_db.run(database.get_device_ids, DB_NAME)
+        return loop.time() - start
+
+    ticking = asyncio.create_task(ticker())
+    slow = asyncio.create_task(async_db.run(slow_write, DB_NAME))
+    await asyncio.sleep(TICK)
+    other = await other_handler()
+    await slow
+    stop.set()
+    await ticking
+    return gaps, other
+
+def test_slow_write_does_not_block_event_loop():
+    gaps, other = asyncio.run(_measure())
+    # La coroutine témoin continue de tourner pendant toute l'écriture lente
+    assert len(gaps) >= SLOW_WRITE / TICK / 2, f"{len(gaps)} ticks pendant l'écriture lente"
+    assert max(gaps) < SLOW_WRITE / 2, f"boucle bloquée {max(gaps) * 1000:.0f} ms"
+    # Une lecture d'un autre handler aboutit sans attendre la fin de la transaction (WAL)
+    assert other < SLOW_WRITE / 2, f"lecture concurrente servie en {other * 1000:.0f} ms"
+
+if __name__ == '__main__':
+    test_slow_write_does_not_block_event_loop()
+    print("ok")
@@ -0,0 +1,131 @@
+# trash.py
+import logging
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+import blob_store
+import database
+from config import DATA_PATH, DB_NAME, CAS_ENABLED, TRASH_WORKERS
+
+logger = logging.getLogger(__name__)
+
+# Corbeille sur le même système de fichiers que les dossiers d'appareils : le déplacement est un simple rename
+TRASH_PATH = os.path.join(DATA_PATH, '.trash')
+
+# Nombre de fichiers supprimés par tâche
+UNLINK_BATCH = 256
+
+# Un seul dossier libéré à la fois; ses fichiers sont supprimés en parallèle
+_walker = ThreadPoolExecutor(max_workers=1, thread_name_prefix='trash')
+_unlinkers = ThreadPoolExecutor(max_workers=TRASH_WORKERS, thread_name_prefix='trash-unlink')
+_stopping = threading.Event()
+
+def move_to_trash(path, device_id, db_name=DB_NAME):
+    """Place un dossier dans la corbeille (enregistrement puis rename atomique); renvoie son chemin dans la corbeille.
+
+    L'appareil est supprimé de la base par l'enregistrement, et restauré si le déplacement échoue.
+    """
+    os.makedirs(TRASH_PATH, exist_ok=True)
+    trash_path = os.path.join(TRASH_PATH, f"{device_id}.{uuid.uuid4().hex}")
+    # Enregistré avant le déplacement : une interruption entre les deux est reprise au démarrage
+    database.add_trash(db_name, trash_path, path, device_id)
+    try:
+        os.rename(path, trash_path)
+    except OSError:
+        database.cancel_trash(db_name, trash_path, path)
+        raise
+    return trash_path
+
+def _unlink_all(paths):
+    for path in paths:
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    return len(paths)
+
+def _remove_tree(root):
+    """Supprime une arborescence : parcours séquentiel, suppressions des fichiers par lots en parallèle.
+
+    Renvoie le nombre de fichiers supprimés, ou None si l'arrêt du bot a interrompu la suppression.
+    """
+    directories = []
+    pending = []
+    batch = []
+    stack = [root]
+    while stack:
+        if _stopping.is_set():
+            wait(pending)
+            return None
+        directory = stack.pop()
+        directories.append(directory)
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                else:
+                    batch.append(entry.path)
+                    if len(batch) >= UNLINK_BATCH:
+                        pending.append(_unlinkers.submit(_unlink_all, batch))
+                        batch = []
+    if batch:
+        pending.append(_unlinkers.submit(_unlink_all, batch))
+    done, _ = wait(pending)
+    removed = sum(future.result() for future in done)
+
+    # Les sous-dossiers sont découverts après leur parent : ordre inverse pour les vider d'abord
+    for directory in reversed(directories):
+        os.rmdir(directory)
+    return removed
+
+def reclaim(trash_path, db_name=DB_NAME):
+    """Libère l'espace d'un dossier de la corbeille puis oublie son enregistrement"""
+    if os.path.isdir(trash_path):
+        removed = _remove_tree(trash_path)
+        if removed is None:
+            return  # Reprise au prochain démarrage
+        logger.info(f"Corbeille : {removed} fichier(s) supprimé(s) dans {trash_path}")
+    if CAS_ENABLED:
+        # Après la suppression des liens : les blobs qui n'ont plus de lien sont libérés
+        # (références reportées sur le chemin de la corbeille par move_to_trash)
+        blob_store.release(trash_path, db_name)
+    database.delete_trash(db_name, trash_path)
+
+def _log_failure(future):
+    if not future.cancelled() and future.exception() is not None:
+        logger.error(f"Échec de la libération de la corbeille: {future.exception()}")
+
+def reclaim_later(trash_path, db_name=DB_NAME):
+    """Planifie la libération d'un dossier de la corbeille en arrière-plan"""
+    _walker.submit(reclaim, trash_path, db_name).add_done_callback(_log_failure)
+
+def resume(db_name=DB_NAME):
+    """Reprend les suppressions interrompues par un arrêt; renvoie le nombre de dossiers replanifiés"""
+    count = 0
+    known = set()
+    for trash_path, original_path, device_id in database.list_trash(db_name):
+        known.add(trash_path)
+        if not os.path.exists(trash_path) and os.path.isdir(original_path):
+            # Arrêt entre l'enregistrement et le déplacement : terminer le déplacement
+            # (l'appareil a déjà été supprimé de la base par l'enregistrement)
+            os.rename(original_path, trash_path)
+        reclaim_later(trash_path, db_name)
+        count += 1
+
+    # Dossiers présents dans la corbeille sans enregistrement : simplement supprimés
+    try:
+        entries = list(os.scandir(TRASH_PATH))
+    except FileNotFoundError:
+        return count
+    for entry in entries:
+        if entry.path not in known and entry.is_dir(follow_symlinks=False):
+            reclaim_later(entry.path, db_name)
+            count += 1
+    return count
+
+def shutdown():
+    """Interrompt la libération en cours (reprise au prochain démarrage)"""
+    _stopping.set()
+    _walker.shutdown(wait=True, cancel_futures=True)
+    _unlinkers.shutdown(wait=True)
@@ -0,0 +1,132 @@
+# uploads.py
+import asyncio
+import hashlib
+import os
+import tempfile
+import urllib.parse
+import httpx
+import async_db
+import blob_store
+import file_manager
+from config import DATA_PATH, MAX_UPLOAD_SIZE, UPLOAD_CONCURRENCY, CAS_ENABLED
+
+CHUNK_SIZE = 256 * 1024
+
+# Dossier temporaire sur le même volume que les données : le renommage final est atomique
+INCOMING_PATH = os.path.join(DATA_PATH, '.incoming')
+
+def _file_mode():
+    # Lu à l'import (un seul thread) : os.umask ne peut être lu qu'en le modifiant
+    umask = os.umask(0)
+    os.umask(umask)
+    return 0o666 & ~umask
+
+# Droits d'un fichier reçu : ceux d'un open() ordinaire (mkstemp crée en 0600)
+FILE_MODE = _file_mode()
+
+class UploadTooLarge(Exception):
+    """Le fichier dépasse la taille maximale autorisée"""
+
+_semaphore = asyncio.Semaphore(UPLOAD_CONCURRENCY)
+_client = None
+
+def _get_client():
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(timeout=httpx.Timeout(30.0, connect=10.0))
+    return _client
+
+async def close():
+    """Ferme le client HTTP partagé"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+async def _iter_chunks(file_path):
+    """Lit le contenu d'un fichier Telegram par blocs, sans le charger en mémoire"""
+    if os.path.isabs(file_path) and os.path.isfile(file_path):
+        # Serveur Bot API local : le fichier est déjà sur le disque
+        with open(file_path, 'rb') as f:
+            while chunk := f.read(CHUNK_SIZE):
+                yield chunk
+        return
+
+    parts = urllib.parse.urlsplit(file_path)
+    url = urllib.parse.urlunsplit(parts._replace(path=urllib.parse.quote(parts.path)))
+    async with _get_client().stream('GET', url) as response:
+        response.raise_for_status()
+        async for chunk in response.aiter_bytes(CHUNK_SIZE):
+            yield chunk
+
+def _reserve_name(directory, file_name):
+    """Réserve atomiquement un nom libre dans le dossier (« nom (1).ext » en cas de doublon)"""
+    stem, ext = os.path.splitext(file_name)
+    candidate, n = file_name, 0
+    while True:
+        path = os.path.join(directory, candidate)
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, FILE_MODE))
+            return path
+        except FileExistsError:
+            n += 1
+            candidate = f"{stem} ({n}){ext}"
+
+def _discard(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+async def ingest(file, directory, file_name, expected_size=None):
+    """Télécharge un fichier Telegram par blocs puis le place atomiquement dans le dossier.
+
+    Renvoie (chemin final, sha256 hexadécimal, taille en octets).
+    """
+    if expected_size and expected_size > MAX_UPLOAD_SIZE:
+        raise UploadTooLarge(file_name)
+
+    # Jamais de chemin fourni par l'utilisateur
+    file_name = os.path.basename(file_name or '') or 'fichier'
+
+    async with _semaphore:
+        os.makedirs(INCOMING_PATH, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=INCOMING_PATH, suffix='.part')
+        os.fchmod(fd, FILE_MODE)
+        digest = hashlib.sha256()
+        size = 0
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                async for chunk in _iter_chunks(file.file_path):
+                    size += len(chunk)
+                    if size > MAX_UPLOAD_SIZE:
+                        raise UploadTooLarge(file_name)
+                    digest.update(chunk)
+                    out.write(chunk)
+
+            file_manager.ensure_folder(directory)
+            final_path = _reserve_name(directory, file_name)
+        except BaseException:
+            _discard(tmp_path)
+            raise
+
+        try:
+            if CAS_ENABLED:
+                await async_db.run(blob_store.adopt, tmp_path, digest.hexdigest(), size, final_path)
+            else:
+                os.replace(tmp_path, final_path)
+        except BaseException:
+            _discard(tmp_path)
+            _discard(final_path)  # Nom réservé
+            raise
+
+    return final_path, digest.hexdigest(), size
+
+def cleanup_incoming():
+    """Supprime les fichiers temporaires laissés par un arrêt brutal"""
+    try:
+        for entry in os.scandir(INCOMING_PATH):
+            if entry.name.endswith('.part'):
+                os.unlink(entry.path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,31 @@
+# validation.py
+import re
+
+# Types d'identifiants d'appareil
+IMEI = "imei"
+SN = "sn"
+INTERNATIONAL = "international"
+
+# Motifs compilés une seule fois
+_IMEI_PATTERN = re.compile(r'\d{15}')               # IMEI
+_SN_PATTERN = re.compile(r'\w{5,20}')               # SN
+_INTERNATIONAL_PATTERN = re.compile(r'\+\d{6,15}')  # Numéro international
+
+def classify_device_id(input_str):
+    """Retourne le type de l'identifiant (IMEI, SN ou numéro international), ou None s'il est invalide"""
+    # Rejet rapide : aucun format ne sort de 5 à 20 caractères
+    length = len(input_str)
+    if length < 5 or length > 20:
+        return None
+    
+    # Seuls les numéros internationaux commencent par '+'
+    if input_str[0] == '+':
+        return INTERNATIONAL if _INTERNATIONAL_PATTERN.fullmatch(input_str) else None
+    
+    if length == 15 and _IMEI_PATTERN.fullmatch(input_str):
+        return IMEI
+    return SN if _SN_PATTERN.fullmatch(input_str) else None
+
+def validate_device_id(input_str):
+    """Valide un identifiant d'appareil"""
+    return classify_device_id(input_str) is not None
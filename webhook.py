@@ -0,0 +1,95 @@
+# webhook.py
+import hashlib
+import hmac
+import logging
+import secrets
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import PlainTextResponse, Response
+from starlette.routing import Route
+from telegram import Update
+from config import (
+    WEBHOOK_URL, PORT, WEBHOOK_PATH, WEBHOOK_SECRET,
+    WEBHOOK_MAX_PENDING, WEBHOOK_MAX_CONNECTIONS
+)
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+def telegram_secret(secret):
+    """Jeton accepté par Telegram (A-Z, a-z, 0-9, _ et -) dérivé de WEBHOOK_SECRET, quel que soit son format"""
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+def create_app(application, secret_token, url_path=WEBHOOK_PATH, max_pending=WEBHOOK_MAX_PENDING):
+    """Application ASGI : réception des mises à jour sur /<url_path> et sonde de santé sur /healthz"""
+
+    async def receive_update(request: Request):
+        # Comparaison en octets : compare_digest refuse les str non ASCII (en-tête arbitraire)
+        received = request.headers.get(SECRET_HEADER, '').encode('latin-1', 'replace')
+        if not hmac.compare_digest(received, secret_token.encode('latin-1')):
+            return Response(status_code=403)
+        # Trop de mises à jour en attente : Telegram renverra celle-ci plus tard.
+        # En mode concurrent, PTB vide la file aussitôt et crée une tâche par mise à jour :
+        # celles-ci sont comptées par OrderedApplication.
+        pending = application.update_queue.qsize() + getattr(application, 'pending_updates', 0)
+        if pending >= max_pending:
+            return Response(status_code=503)
+        try:
+            update = Update.de_json(await request.json(), application.bot)
+        except Exception:
+            return Response(status_code=400)
+        await application.update_queue.put(update)
+        return Response()
+
+    async def healthz(request: Request):
+        if not application.running:
+            return PlainTextResponse("starting", status_code=503)
+        return PlainTextResponse("ok")
+
+    return Starlette(routes=[
+        Route(f"/{url_path}", receive_update, methods=['POST']),
+        Route('/healthz', healthz, methods=['GET'])
+    ])
+
+async def run(application, listen='0.0.0.0', port=PORT):
+    """Démarre le bot en mode webhook et sert les requêtes jusqu'à l'arrêt du processus"""
+    # Sans jeton configuré, un jeton aléatoire est enregistré auprès de Telegram à chaque démarrage.
+    # WEBHOOK_SECRET peut contenir des caractères refusés par Telegram (valeur base64 générée par Render) :
+    # le jeton envoyé à Telegram et vérifié à la réception en est dérivé.
+    secret_token = telegram_secret(WEBHOOK_SECRET) if WEBHOOK_SECRET else secrets.token_urlsafe(32)
+    server = uvicorn.Server(uvicorn.Config(
+        create_app(application, secret_token),
+        host=listen,
+        port=port,
+        log_level='warning'
+    ))
+
+    await application.initialize()
+    try:
+        if application.post_init:
+            await application.post_init(application)
+        if WEBHOOK_URL:
+            await application.bot.set_webhook(
+                url=f"{WEBHOOK_URL}/{WEBHOOK_PATH}",
+                secret_token=secret_token,
+                max_connections=WEBHOOK_MAX_CONNECTIONS,
+                allowed_updates=Update.ALL_TYPES
+            )
+        else:
+            # Test local : les mises à jour sont postées directement sur l'endpoint
+            logger.warning(
+                "WEBHOOK_URL absent : webhook non enregistré auprès de Telegram "
+                "(définir WEBHOOK_SECRET et envoyer sha256(WEBHOOK_SECRET) en hexadécimal "
+                f"dans l'en-tête {SECRET_HEADER} pour poster des mises à jour en local)"
+            )
+        await application.start()
+        logger.info(f"Webhook à l'écoute sur {listen}:{port}/{WEBHOOK_PATH}")
+        await server.serve()
+    finally:
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        if application.post_shutdown:
+            await application.post_shutdown(application)